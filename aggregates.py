@@ -0,0 +1,321 @@
+"""
+Funcoes de agregacao das transacoes por mes.
+TransactionColumns guarda as transacoes em colunas NumPy e calcula os
+totais com reducoes vetorizadas.
+O MonthlyIndex e montado em uma unica passada sobre as transacoes (ou a
+partir de totais ja agregados no banco) e responde totais do mes, gastos
+por categoria e series mensais em O(1).
+"""
+
+from datetime import date
+from dateutil.relativedelta import relativedelta
+
+import numpy as np
+
+# Codigos de tipo usados nas colunas (TransactionColumns.types)
+TRANSACTION_TYPES = ("income", "expense")
+
+# Colunas do TransactionColumns (mesma ordem de TransactionColumns.encode)
+COLUMN_NAMES = ("days", "months", "types", "category", "amounts")
+
+
+def get_month_key(dt):
+    """Retorna chave do mes no formato YYYY-MM"""
+    if isinstance(dt, str):
+        return dt[:7]
+    return dt.strftime("%Y-%m")
+
+
+def add_months(year_month, delta):
+    """Adiciona meses a uma data YYYY-MM"""
+    year, month = map(int, year_month.split("-"))
+    dt = date(year, month, 1) + relativedelta(months=delta)
+    return dt.strftime("%Y-%m")
+
+
+def get_month_range(first_month, last_month):
+    """Retorna intervalo (inicio, fim exclusivo) em YYYY-MM-DD cobrindo os meses dados"""
+    return f"{first_month}-01", f"{add_months(last_month, 1)}-01"
+
+
+def get_monthly_totals(transactions, target_month, projected=()):
+    """
+    Calcula totais do mes (aceita lista de transacoes ou TransactionColumns).
+    projected: linhas {month, type, total} de ocorrencias previstas (ver
+    recurring.project_rows), somadas sem virar transacoes.
+    """
+    if not isinstance(transactions, TransactionColumns):
+        transactions = TransactionColumns.from_transactions(transactions)
+    totals = transactions.totals(target_month)
+    for row in projected:
+        if row["month"] == target_month:
+            totals[row["type"]] += float(row["total"])
+    totals["balance"] = totals["income"] - totals["expense"]
+    return totals
+
+
+def aggregate_transactions(transactions):
+    """
+    Agrupa transacoes em linhas {month, type, category, total, count}.
+    Equivalente local da funcao SQL dashboard_totals (migrations/).
+    """
+    if not isinstance(transactions, TransactionColumns):
+        transactions = TransactionColumns.from_transactions(transactions)
+    return transactions.aggregate()
+
+
+def month_ordinal(year_month):
+    """Converte YYYY-MM em numero de meses desde 1970-01"""
+    return int(np.datetime64(year_month, "M").astype(np.int64))
+
+
+def ordinal_to_month(ordinal):
+    """Converte numero de meses desde 1970-01 em YYYY-MM"""
+    return str(np.datetime64(int(ordinal), "M"))
+
+
+class TransactionColumns:
+    """
+    Transacoes em colunas (arrays NumPy): dia e mes como inteiros, tipo e
+    categoria como codigos e valores em float64. Ocupa uma fracao da lista
+    de dicts e os totais saem de reducoes vetorizadas (bincount), sem
+    reinterpretar a data de cada transacao a cada consulta.
+    Montadas com index_ids=True aceitam upsert/remove por id: alteracoes e
+    remocoes sao gravadas no lugar e inclusoes vao para a capacidade livre
+    dos arrays (que dobra quando enche), sem remontar as colunas.
+    """
+
+    def __init__(self, categories=()):
+        # Tabela de categorias: codigo -> nome e nome -> codigo
+        self.categories = list(categories)
+        self.category_codes = {name: code for code, name in enumerate(self.categories)}
+        self.days = np.empty(0, dtype=np.int32)     # dias desde 1970-01-01
+        self.months = np.empty(0, dtype=np.int32)   # meses desde 1970-01
+        self.types = np.empty(0, dtype=np.int8)     # indice em TRANSACTION_TYPES
+        self.category = np.empty(0, dtype=np.int16)
+        self.amounts = np.empty(0, dtype=np.float64)
+        self.ids = None        # [id] de cada linha (index_ids=True)
+        self.positions = None  # id -> linha
+        self.buffers = {}      # coluna -> array com capacidade livre (as colunas sao prefixos)
+
+    @classmethod
+    def from_transactions(cls, transactions, categories=(), index_ids=False):
+        """Monta as colunas a partir de transacoes no formato do app (index_ids: ver upsert)"""
+        rows = list(transactions)
+        columns = cls(categories)
+        codes = columns.category_codes
+        dates = np.array([t["date"][:10] for t in rows], dtype="datetime64[D]")
+        columns.days = dates.astype(np.int32)
+        columns.months = dates.astype("datetime64[M]").astype(np.int32)
+        columns.types = np.fromiter((t["type"] == "expense" for t in rows), dtype=np.int8, count=len(rows))
+        columns.category = np.fromiter(
+            (codes.setdefault(t["category"], len(codes)) for t in rows), dtype=np.int16, count=len(rows)
+        )
+        columns.categories = list(codes)
+        columns.amounts = np.fromiter((float(t["amount"]) for t in rows), dtype=np.float64, count=len(rows))
+        if index_ids:
+            columns.ids = [t["id"] for t in rows]
+            columns.positions = {transaction_id: i for i, transaction_id in enumerate(columns.ids)}
+        return columns
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def encode(self, transaction):
+        """Valores da transacao em cada coluna (registra categoria nova)"""
+        day = np.datetime64(transaction["date"][:10], "D")
+        category = self.category_codes.setdefault(transaction["category"], len(self.categories))
+        if category == len(self.categories):
+            self.categories.append(transaction["category"])
+        return (day.astype(np.int32), day.astype("datetime64[M]").astype(np.int32),
+                int(transaction["type"] == "expense"), category, float(transaction["amount"]))
+
+    def upsert(self, transaction):
+        """Inclui a transacao ou altera a linha dela no lugar (colunas com index_ids)"""
+        values = self.encode(transaction)
+        position = self.positions.get(transaction["id"])
+        if position is None:
+            position = len(self)
+            self.reserve(position + 1)
+            for name in COLUMN_NAMES:
+                setattr(self, name, self.buffers[name][:position + 1])
+            self.ids.append(transaction["id"])
+            self.positions[transaction["id"]] = position
+        for name, value in zip(COLUMN_NAMES, values):
+            getattr(self, name)[position] = value
+
+    def remove(self, transaction_id):
+        """Remove a linha da transacao trazendo a ultima para o lugar dela (colunas com index_ids)"""
+        position = self.positions.pop(transaction_id, None)
+        if position is None:
+            return
+        last = len(self) - 1
+        for name in COLUMN_NAMES:
+            column = getattr(self, name)
+            column[position] = column[last]
+            setattr(self, name, column[:last])
+        moved = self.ids.pop()
+        if position != last:
+            self.ids[position] = moved
+            self.positions[moved] = position
+
+    def reserve(self, size):
+        """Garante capacidade para size linhas; dobra ao crescer (inclusao em O(1) amortizado)"""
+        capacity = len(self.buffers["amounts"]) if self.buffers else 0
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 16)
+        for name in COLUMN_NAMES:
+            column = getattr(self, name)
+            buffer = np.empty(capacity, dtype=column.dtype)
+            buffer[:len(column)] = column
+            self.buffers[name] = buffer
+
+    def date_mask(self, start=None, end=None):
+        """Mascara das transacoes com start <= date < end (YYYY-MM-DD; None = sem limite)"""
+        mask = np.ones(len(self), dtype=bool)
+        if start:
+            mask &= self.days >= np.datetime64(start, "D").astype(np.int32)
+        if end:
+            mask &= self.days < np.datetime64(end, "D").astype(np.int32)
+        return mask
+
+    def totals(self, month):
+        """Retorna receitas, despesas e saldo do mes"""
+        mask = self.months == month_ordinal(month)
+        income, expense = np.bincount(self.types[mask], weights=self.amounts[mask], minlength=2)
+        return {
+            "income": float(income),
+            "expense": float(expense),
+            "balance": float(income - expense)
+        }
+
+    def category_totals(self, month, tipo="expense"):
+        """Retorna {categoria: total} do mes para o tipo informado"""
+        mask = (self.months == month_ordinal(month)) & (self.types == TRANSACTION_TYPES.index(tipo))
+        codes = self.category[mask]
+        size = len(self.categories)
+        totals = np.bincount(codes, weights=self.amounts[mask], minlength=size)
+        counts = np.bincount(codes, minlength=size)
+        return {self.categories[code]: float(totals[code]) for code in np.flatnonzero(counts)}
+
+    def series(self, months):
+        """Retorna (receitas, despesas) de cada mes da lista"""
+        if not months:
+            return [], []
+        ordinals = np.array([month_ordinal(m) for m in months])
+        first = ordinals.min()
+        span = int(ordinals.max() - first) + 1
+        offsets = self.months - first
+        mask = (offsets >= 0) & (offsets < span)
+        sums = np.bincount(offsets[mask] * 2 + self.types[mask], weights=self.amounts[mask],
+                           minlength=span * 2).reshape(span, 2)
+        selected = sums[ordinals - first]
+        return selected[:, 0].tolist(), selected[:, 1].tolist()
+
+    def aggregate(self, start=None, end=None):
+        """Agrupa em linhas {month, type, category, total, count} (ver aggregate_transactions)"""
+        mask = self.date_mask(start, end)
+        if not mask.any():
+            return []
+        months = self.months[mask].astype(np.int64)
+        first = months.min()
+        size = max(len(self.categories), 1)
+        keys = ((months - first) * 2 + self.types[mask]) * size + self.category[mask]
+        unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        totals = np.bincount(inverse, weights=self.amounts[mask])
+        rows = []
+        for key, total, count in zip(unique_keys.tolist(), totals.tolist(), counts.tolist()):
+            group, code = divmod(key, size)
+            offset, tipo = divmod(group, 2)
+            rows.append({
+                "month": ordinal_to_month(first + offset),
+                "type": TRANSACTION_TYPES[tipo],
+                "category": self.categories[code],
+                "total": total,
+                "count": count
+            })
+        return rows
+
+
+class MonthlyIndex:
+    """
+    Totais por (mes, tipo, categoria).
+    Montado uma vez a partir da lista de transacoes e atualizado
+    incrementalmente com add/remove quando uma transacao muda.
+    """
+
+    def __init__(self, transactions=None):
+        # {mes: {tipo: {categoria: total}}}
+        self.by_month = {}
+        # {(mes, tipo, categoria): quantidade} - permite remover chaves zeradas
+        self.counts = {}
+        for t in transactions or []:
+            self.add(t)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Monta o indice a partir de linhas ja agregadas (ver aggregate_transactions)"""
+        index = cls()
+        for row in rows:
+            index.add_total(row["month"], row["type"], row["category"], row["total"], row["count"])
+        return index
+
+    def add(self, transaction):
+        """Soma a transacao nos totais"""
+        self._apply(transaction["date"], transaction["type"], transaction["category"],
+                    float(transaction["amount"]), 1)
+
+    def remove(self, transaction):
+        """Desconta a transacao dos totais"""
+        self._apply(transaction["date"], transaction["type"], transaction["category"],
+                    -float(transaction["amount"]), -1)
+
+    def add_total(self, month, tipo, category, total, count=1):
+        """Soma um total ja agregado (ex: linha vinda do banco)"""
+        self._apply(month, tipo, category, float(total), count)
+
+    def _apply(self, dt, tipo, category, amount, count):
+        month = get_month_key(dt)
+        key = (month, tipo, category)
+        remaining = self.counts.get(key, 0) + count
+        categories = self.by_month.setdefault(month, {}).setdefault(tipo, {})
+        if remaining <= 0:
+            self.counts.pop(key, None)
+            categories.pop(category, None)
+        else:
+            self.counts[key] = remaining
+            categories[category] = categories.get(category, 0.0) + amount
+
+    def rows(self):
+        """Retorna o indice como linhas {month, type, category, total, count}"""
+        return [
+            {"month": month, "type": tipo, "category": category,
+             "total": self.by_month[month][tipo][category], "count": count}
+            for (month, tipo, category), count in self.counts.items()
+        ]
+
+    def totals(self, month):
+        """Retorna receitas, despesas e saldo do mes"""
+        types = self.by_month.get(month, {})
+        income = sum(types.get("income", {}).values())
+        expense = sum(types.get("expense", {}).values())
+        return {
+            "income": income,
+            "expense": expense,
+            "balance": income - expense
+        }
+
+    def category_totals(self, month, tipo="expense"):
+        """Retorna {categoria: total} do mes para o tipo informado"""
+        return dict(self.by_month.get(month, {}).get(tipo, {}))
+
+    def series(self, months):
+        """Retorna (receitas, despesas) de cada mes da lista"""
+        income_data = []
+        expense_data = []
+        for month in months:
+            totals = self.totals(month)
+            income_data.append(totals["income"])
+            expense_data.append(totals["expense"])
+        return income_data, expense_data
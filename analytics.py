@@ -0,0 +1,80 @@
+"""
+Analises de varios meses (12, 24, 60...) para os graficos do painel.
+Monta uma matriz (tipo x categoria x mes) a partir das linhas agregadas
+{month, type, category, total, count} numa unica passada vetorizada; series
+mensais, series por categoria e medias moveis saem de reducoes sobre ela.
+"""
+
+import numpy as np
+
+from aggregates import TRANSACTION_TYPES, month_ordinal
+
+
+def month_list(first_month, last_month):
+    """Retorna os meses YYYY-MM de first_month ate last_month (inclusive)"""
+    first = np.datetime64(first_month, "M")
+    last = np.datetime64(last_month, "M")
+    return np.arange(first, last + 1).astype(str).tolist()
+
+
+def rolling_mean(values, window):
+    """
+    Media movel simples de window meses (sobre o ultimo eixo: aceita uma
+    serie ou uma matriz com uma serie por linha).
+    Os primeiros meses usam a media do que existe ate eles (janela parcial).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    size = values.shape[-1] if values.ndim else 0
+    if window <= 1 or size == 0:
+        return values
+    sums = np.cumsum(values, axis=-1)
+    sums[..., window:] = sums[..., window:] - sums[..., :-window]
+    return sums / np.minimum(np.arange(1, size + 1), window)
+
+
+class MonthlyTrends:
+    """
+    Totais por tipo, categoria e mes de um intervalo de meses.
+    values[tipo, categoria, mes] com tipo indexado por TRANSACTION_TYPES.
+    """
+
+    def __init__(self, rows, first_month, last_month):
+        self.months = month_list(first_month, last_month)
+        rows = list(rows)
+        names = {}
+        categories = np.fromiter((names.setdefault(r["category"], len(names)) for r in rows),
+                                 dtype=np.int64, count=len(rows))
+        self.categories = list(names)
+
+        first = month_ordinal(first_month)
+        offsets = np.fromiter((month_ordinal(r["month"]) - first for r in rows), dtype=np.int64, count=len(rows))
+        types = np.fromiter((TRANSACTION_TYPES.index(r["type"]) for r in rows), dtype=np.int64, count=len(rows))
+        totals = np.fromiter((float(r["total"]) for r in rows), dtype=np.float64, count=len(rows))
+
+        # Linhas fora do intervalo sao ignoradas
+        inside = (offsets >= 0) & (offsets < len(self.months))
+        self.values = np.zeros((len(TRANSACTION_TYPES), len(self.categories), len(self.months)))
+        np.add.at(self.values, (types[inside], categories[inside], offsets[inside]), totals[inside])
+
+    @classmethod
+    def from_index(cls, index, first_month, last_month):
+        """Monta a partir de um MonthlyIndex (ver Database.load_monthly_index)"""
+        return cls(index.rows(), first_month, last_month)
+
+    def totals(self, tipo):
+        """Serie mensal do tipo ("income" ou "expense"), somando todas as categorias"""
+        return self.values[TRANSACTION_TYPES.index(tipo)].sum(axis=0)
+
+    def balance(self):
+        """Serie mensal de receitas - despesas"""
+        return self.totals("income") - self.totals("expense")
+
+    def category_series(self, tipo="expense", window=1):
+        """
+        Retorna {categoria: serie mensal} das categorias com algum valor no periodo.
+        window > 1 aplica media movel em cada serie.
+        """
+        matrix = self.values[TRANSACTION_TYPES.index(tipo)]
+        used = np.flatnonzero(np.abs(matrix).sum(axis=1) > 0)
+        smoothed = rolling_mean(matrix[used], window)
+        return {self.categories[i]: series.tolist() for i, series in zip(used, smoothed)}
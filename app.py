@@ -1,11 +1,15 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 import uuid
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 
+from aggregates import add_months, get_month_range
+from analytics import MonthlyTrends, rolling_mean
 from database import get_database, get_current_user
+from importer import import_statement
+from recurring import new_rule, project_rows
+from reminders import RECURRENCE_LABELS, RECURRENCES
+from search import SearchIndex
 
 # =============================================================================
 # Configuracao da Pagina
@@ -30,6 +34,18 @@ CATEGORIES = [
     "Outros"
 ]
 
+PAGE_SIZES = [10, 20, 50, 100]
+
+# Periodos dos graficos de tendencia (meses) e janela da media movel
+TREND_PERIODS = [6, 12, 24, 60]
+ROLLING_WINDOW = 3
+
+# Dias a frente em que lembretes recorrentes sao listados
+REMINDER_HORIZON_DAYS = 90
+
+# Figuras de graficos mantidas em cache (as menos usadas saem primeiro)
+FIGURE_CACHE_ENTRIES = 64
+
 CATEGORY_COLORS = {
     "Alimentacao": "#2b6cb0",
     "Transporte": "#63b3ed",
@@ -60,36 +76,94 @@ def format_currency(value):
     return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
 
-def get_month_key(dt):
-    """Retorna chave do mes no formato YYYY-MM"""
-    if isinstance(dt, str):
-        return dt[:7]
-    return dt.strftime("%Y-%m")
+# =============================================================================
+# Graficos (plotly e importado apenas no primeiro grafico desenhado)
+# =============================================================================
+# Figuras ficam em cache pelos totais agregados: dashboards sem mudanca
+# reaproveitam a figura pronta (st.plotly_chart nao revalida um Figure)
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_category_pie(category_items):
+    """Monta grafico de pizza dos gastos por categoria ((categoria, total), ...)"""
+    import plotly.express as px
+    
+    names = [cat for cat, _ in category_items]
+    fig_pie = px.pie(
+        values=[total for _, total in category_items],
+        names=names,
+        color=names,
+        color_discrete_map=CATEGORY_COLORS,
+        hole=0.4
+    )
+    fig_pie.update_layout(
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=-0.3),
+        margin=dict(t=20, b=20, l=20, r=20)
+    )
+    return fig_pie
 
 
-def get_monthly_totals(transactions, target_month):
-    """Calcula totais do mes"""
-    month_transactions = [
-        t for t in transactions 
-        if get_month_key(t["date"]) == target_month
-    ]
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_monthly_bar(months, income_data, expense_data, expense_average=()):
+    """
+    Monta grafico de barras de receitas x despesas por mes (tuplas alinhadas por mes).
+    expense_average adiciona a linha da media movel das despesas.
+    """
+    import plotly.graph_objects as go
     
-    income = sum(t["amount"] for t in month_transactions if t["type"] == "income")
-    expense = sum(t["amount"] for t in month_transactions if t["type"] == "expense")
+    fig_bar = go.Figure()
+    fig_bar.add_trace(go.Bar(
+        name="Receitas",
+        x=list(months),
+        y=list(income_data),
+        marker_color="#2f855a"
+    ))
+    fig_bar.add_trace(go.Bar(
+        name="Despesas",
+        x=list(months),
+        y=list(expense_data),
+        marker_color="#c53030"
+    ))
+    if expense_average:
+        fig_bar.add_trace(go.Scatter(
+            name=f"Media despesas ({ROLLING_WINDOW} meses)",
+            x=list(months),
+            y=list(expense_average),
+            mode="lines",
+            line=dict(color="#1a202c", dash="dot")
+        ))
     
-    return {
-        "income": income,
-        "expense": expense,
-        "balance": income - expense,
-        "transactions": month_transactions
-    }
+    fig_bar.update_layout(
+        barmode="group",
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=-0.3),
+        margin=dict(t=20, b=20, l=20, r=20),
+        yaxis=dict(tickformat=",.0f")
+    )
+    return fig_bar
 
 
-def add_months(year_month, delta):
-    """Adiciona meses a uma data YYYY-MM"""
-    year, month = map(int, year_month.split("-"))
-    dt = date(year, month, 1) + relativedelta(months=delta)
-    return dt.strftime("%Y-%m")
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_category_lines(months, category_series):
+    """Monta grafico de linhas com a serie mensal de cada categoria ((categoria, serie), ...)"""
+    import plotly.graph_objects as go
+    
+    fig_lines = go.Figure()
+    for category, series in category_series:
+        fig_lines.add_trace(go.Scatter(
+            name=category,
+            x=list(months),
+            y=list(series),
+            mode="lines",
+            line=dict(color=CATEGORY_COLORS.get(category))
+        ))
+    
+    fig_lines.update_layout(
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=-0.3),
+        margin=dict(t=20, b=20, l=20, r=20),
+        yaxis=dict(tickformat=",.0f")
+    )
+    return fig_lines
 
 
 # =============================================================================
@@ -231,9 +305,37 @@ def show_auth_page():
 # =============================================================================
 # Aplicacao Principal
 # =============================================================================
+def show_transaction_row(t):
+    """Exibe uma transacao da lista com os botoes de editar e excluir"""
+    with st.container():
+        col_info, col_actions = st.columns([3, 1])
+        
+        with col_info:
+            tipo_emoji = "🟢" if t["type"] == "income" else "🔴"
+            st.markdown(f"""
+            **{tipo_emoji} {t['description']}**  
+            {format_currency(t['amount'])} - {t['date']}  
+            `{t['category']}`
+            """)
+        
+        with col_actions:
+            col_edit, col_delete = st.columns(2)
+            with col_edit:
+                if st.button("✏️", key=f"edit_{t['id']}", help="Editar"):
+                    st.session_state.editing_transaction = t
+                    st.rerun()
+            with col_delete:
+                if st.button("🗑️", key=f"del_{t['id']}", help="Excluir"):
+                    db.delete_transaction(t["id"])
+                    st.rerun()
+        
+        st.divider()
+
+
 def show_main_app():
     """Exibe aplicacao principal (usuario logado)"""
     user = get_current_user()
+    db.begin_rerun()
     
     # Header
     st.markdown('<h1 class="main-header">Controle Financeiro</h1>', unsafe_allow_html=True)
@@ -269,8 +371,38 @@ def show_main_app():
             format_func=lambda x: datetime.strptime(x, "%Y-%m").strftime("%B %Y").capitalize()
         )
         
+        trend_months = st.selectbox(
+            "Periodo dos graficos",
+            options=TREND_PERIODS,
+            format_func=lambda n: f"Ultimos {n} meses",
+            key="trend_months"
+        )
+        
         st.divider()
-        st.markdown('<div class="db-status db-cloud">☁️ Dados seguros na nuvem</div>', unsafe_allow_html=True)
+        if db.get_mode() == "sqlite":
+            st.markdown('<div class="db-status db-local">🗄️ Banco SQLite local</div>', unsafe_allow_html=True)
+        else:
+            st.markdown('<div class="db-status db-cloud">☁️ Dados seguros na nuvem</div>', unsafe_allow_html=True)
+        
+        pending_writes = db.get_pending_writes()
+        if pending_writes["failed"]:
+            # A fila para no lote que falhou: as alteracoes seguintes esperam para nao chegar fora de ordem
+            st.warning(f"⚠️ {pending_writes['failed']} alteracoes nao enviadas (as seguintes aguardam): "
+                       f"{pending_writes['last_error']}")
+            col_retry, col_discard = st.columns(2)
+            if col_retry.button("Tentar novamente", use_container_width=True):
+                db.retry_failed_writes()
+                st.rerun()
+            if col_discard.button("Descartar", use_container_width=True):
+                db.discard_failed_writes()
+                st.rerun()
+        elif pending_writes["pending"]:
+            st.caption(f"⏳ {pending_writes['pending']} alteracoes aguardando envio")
+    
+    # Janela dos totais: o periodo dos graficos, terminando no mes selecionado
+    first_month = add_months(selected_month, -(trend_months - 1))
+    window_start, window_end = get_month_range(first_month, selected_month)
+    dashboard = db.load_dashboard(window_start, window_end)
     
     # Tabs
     tab_resumo, tab_transacoes, tab_metas, tab_lembretes = st.tabs([
@@ -279,8 +411,8 @@ def show_main_app():
     
     # Tab Resumo
     with tab_resumo:
-        transactions = db.load_transactions()
-        totals = get_monthly_totals(transactions, selected_month)
+        monthly_index = dashboard["monthly_index"]
+        totals = monthly_index.totals(selected_month)
         
         col1, col2, col3 = st.columns(3)
         
@@ -309,6 +441,16 @@ def show_main_app():
                 delta_color="off"
             )
         
+        projected = project_rows(dashboard["recurring_rules"], *get_month_range(selected_month, selected_month))
+        if projected:
+            projected_totals = {"income": 0.0, "expense": 0.0}
+            for row in projected:
+                projected_totals[row["type"]] += row["total"]
+            st.caption(
+                f"🔁 Inclui previsao de recorrentes: {format_currency(projected_totals['income'])} em receitas "
+                f"e {format_currency(projected_totals['expense'])} em despesas."
+            )
+        
         st.divider()
         
         col_chart1, col_chart2 = st.columns(2)
@@ -316,71 +458,47 @@ def show_main_app():
         with col_chart1:
             st.subheader("Gastos por Categoria")
             
-            category_totals = {}
-            for cat in CATEGORIES:
-                total = sum(
-                    t["amount"] for t in totals["transactions"]
-                    if t["type"] == "expense" and t["category"] == cat
-                )
-                if total > 0:
-                    category_totals[cat] = total
+            expense_by_category = monthly_index.category_totals(selected_month, "expense")
+            category_totals = {
+                cat: expense_by_category[cat] for cat in CATEGORIES
+                if expense_by_category.get(cat, 0) > 0
+            }
             
             if category_totals:
-                fig_pie = px.pie(
-                    values=list(category_totals.values()),
-                    names=list(category_totals.keys()),
-                    color=list(category_totals.keys()),
-                    color_discrete_map=CATEGORY_COLORS,
-                    hole=0.4
-                )
-                fig_pie.update_layout(
-                    showlegend=True,
-                    legend=dict(orientation="h", yanchor="bottom", y=-0.3),
-                    margin=dict(t=20, b=20, l=20, r=20)
-                )
-                st.plotly_chart(fig_pie, use_container_width=True)
+                st.plotly_chart(build_category_pie(tuple(category_totals.items())), use_container_width=True)
             else:
                 st.info("Nenhuma despesa registrada neste mes.")
         
         with col_chart2:
             st.subheader("Receitas x Despesas")
             
-            months = [add_months(selected_month, i) for i in range(-5, 1)]
-            income_data = []
-            expense_data = []
-            
-            for month in months:
-                month_totals = get_monthly_totals(transactions, month)
-                income_data.append(month_totals["income"])
-                expense_data.append(month_totals["expense"])
+            trends = MonthlyTrends.from_index(monthly_index, first_month, selected_month)
+            expense_data = trends.totals("expense")
             
-            fig_bar = go.Figure()
-            fig_bar.add_trace(go.Bar(
-                name="Receitas",
-                x=months,
-                y=income_data,
-                marker_color="#2f855a"
-            ))
-            fig_bar.add_trace(go.Bar(
-                name="Despesas",
-                x=months,
-                y=expense_data,
-                marker_color="#c53030"
-            ))
-            
-            fig_bar.update_layout(
-                barmode="group",
-                showlegend=True,
-                legend=dict(orientation="h", yanchor="bottom", y=-0.3),
-                margin=dict(t=20, b=20, l=20, r=20),
-                yaxis=dict(tickformat=",.0f")
+            fig_bar = build_monthly_bar(
+                tuple(trends.months),
+                tuple(trends.totals("income").tolist()),
+                tuple(expense_data.tolist()),
+                tuple(rolling_mean(expense_data, ROLLING_WINDOW).tolist())
             )
             st.plotly_chart(fig_bar, use_container_width=True)
+        
+        st.subheader("Despesas por Categoria no Periodo")
+        smooth = st.toggle(f"Media movel ({ROLLING_WINDOW} meses)", key="trend_smooth")
+        category_series = trends.category_series("expense", ROLLING_WINDOW if smooth else 1)
+        
+        if category_series:
+            ordered = [
+                (cat, tuple(category_series[cat]))
+                for cat in CATEGORIES + sorted(set(category_series) - set(CATEGORIES))
+                if cat in category_series
+            ]
+            st.plotly_chart(build_category_lines(tuple(trends.months), tuple(ordered)), use_container_width=True)
+        else:
+            st.info("Nenhuma despesa registrada no periodo.")
     
     # Tab Transacoes
     with tab_transacoes:
-        transactions = db.load_transactions()
-        
         col_form, col_list = st.columns([1, 1.5])
         
         with col_form:
@@ -388,6 +506,21 @@ def show_main_app():
             
             editing = st.session_state.editing_transaction
             
+            # Fora do formulario: ao digitar a descricao a categoria sugerida ja aparece
+            description_key = f"transaction_description_{editing['id'] if editing else 'new'}"
+            descricao = st.text_input(
+                "Descricao",
+                max_chars=60,
+                placeholder="Ex: Mercado",
+                value=editing["description"] if editing else "",
+                key=description_key
+            )
+            suggested = None if editing or not descricao.strip() else db.suggest_category(descricao)
+            if suggested not in CATEGORIES:
+                suggested = None
+            if suggested:
+                st.caption(f"💡 Categoria sugerida pelo historico: {suggested}")
+            
             with st.form("transaction_form", clear_on_submit=True):
                 tipo = st.selectbox(
                     "Tipo",
@@ -409,18 +542,23 @@ def show_main_app():
                     value=datetime.strptime(editing["date"], "%Y-%m-%d").date() if editing else date.today()
                 )
                 
+                # Transacoes antigas podem ter categoria fora da lista: entra como opcao extra
+                category_options = CATEGORIES if not editing or editing["category"] in CATEGORIES else CATEGORIES + [editing["category"]]
                 categoria = st.selectbox(
                     "Categoria",
-                    options=CATEGORIES,
-                    index=CATEGORIES.index(editing["category"]) if editing else 0
+                    options=category_options,
+                    index=category_options.index(editing["category"] if editing else suggested or CATEGORIES[0])
                 )
                 
-                descricao = st.text_input(
-                    "Descricao",
-                    max_chars=60,
-                    placeholder="Ex: Mercado",
-                    value=editing["description"] if editing else ""
-                )
+                # Regras novas apenas: editar uma ocorrencia nao muda a regra
+                # (e so com onde guarda-las: no Supabase, a tabela da migracao 004)
+                frequency = None
+                if not editing and db.supports_recurring():
+                    frequency = st.selectbox(
+                        "Repetir",
+                        list(RECURRENCE_LABELS),
+                        format_func=RECURRENCE_LABELS.get
+                    )
                 
                 col_btn1, col_btn2 = st.columns(2)
                 with col_btn1:
@@ -428,7 +566,7 @@ def show_main_app():
                 with col_btn2:
                     cancelled = st.form_submit_button("Cancelar", use_container_width=True)
             
-            if submitted and descricao:
+            if submitted and descricao.strip():
                 transaction = {
                     "id": editing["id"] if editing else str(uuid.uuid4()),
                     "type": tipo,
@@ -438,18 +576,66 @@ def show_main_app():
                     "description": descricao.strip()
                 }
                 
-                db.save_transaction(transaction)
+                if frequency:
+                    # Grava a regra; as ocorrencias ate hoje viram transacoes em um lote
+                    db.save_recurring_rule(new_rule(transaction, frequency))
+                else:
+                    db.save_transaction(transaction, previous=editing)
                 st.session_state.editing_transaction = None
+                st.session_state.pop(description_key, None)
                 st.rerun()
             
             if cancelled:
                 st.session_state.editing_transaction = None
+                st.session_state.pop(description_key, None)
                 st.rerun()
+            
+            recurring_rules = dashboard["recurring_rules"]
+            if recurring_rules:
+                with st.expander(f"🔁 Lancamentos recorrentes ({len(recurring_rules)})"):
+                    for rule in sorted(recurring_rules, key=lambda r: r["description"] or ""):
+                        col_rule, col_stop = st.columns([4, 1])
+                        with col_rule:
+                            tipo_emoji = "🟢" if rule["type"] == "income" else "🔴"
+                            st.markdown(
+                                f"{tipo_emoji} **{rule['description']}** - {format_currency(rule['amount'])}  \n"
+                                f"{RECURRENCE_LABELS[rule['frequency']]} desde {rule['start_date']} `{rule['category']}`"
+                            )
+                        with col_stop:
+                            if st.button("🗑️", key=f"del_rule_{rule['id']}", help="Encerrar (mantem as transacoes ja lancadas)"):
+                                db.delete_recurring_rule(rule["id"])
+                                st.rerun()
+            
+            with st.expander("📥 Importar extrato (CSV ou OFX)"):
+                statement = st.file_uploader(
+                    "Arquivo do banco",
+                    type=["csv", "ofx"],
+                    help="CSV com colunas data, descricao e valor, ou arquivo OFX"
+                )
+                if statement and st.button("Importar", use_container_width=True):
+                    with st.spinner("Importando..."):
+                        try:
+                            result = import_statement(db, statement, statement.name, CATEGORIES)
+                        except ValueError as e:
+                            st.error(str(e))
+                        else:
+                            st.success(
+                                f"{result['imported']} transacoes importadas, "
+                                f"{result['duplicates']} ja existentes, "
+                                f"{result['invalid']} linhas invalidas, "
+                                f"{result['suggested']} categorias sugeridas pelo historico."
+                            )
         
         with col_list:
             st.subheader("Lista de Transacoes")
             
-            col_filter1, col_filter2 = st.columns(2)
+            search_query = st.text_input(
+                "🔎 Buscar",
+                placeholder="Descricao em todo o historico (ex: mercado)",
+                key="search_query"
+            )
+            
+            col_filter1, col_filter2, col_filter3 = st.columns([2, 2, 1])
             with col_filter1:
                 filter_category = st.selectbox(
                     "Categoria",
@@ -462,54 +648,66 @@ def show_main_app():
                     options=["Todos", "Receitas", "Despesas"],
                     key="filter_type"
                 )
+            with col_filter3:
+                page_size = st.selectbox(
+                    "Por pagina",
+                    options=PAGE_SIZES,
+                    index=1,
+                    key="page_size"
+                )
             
-            filtered_transactions = [
-                t for t in transactions
-                if get_month_key(t["date"]) == selected_month
-            ]
-            
-            if filter_category != "Todas":
-                filtered_transactions = [t for t in filtered_transactions if t["category"] == filter_category]
-            
-            if filter_type == "Receitas":
-                filtered_transactions = [t for t in filtered_transactions if t["type"] == "income"]
-            elif filter_type == "Despesas":
-                filtered_transactions = [t for t in filtered_transactions if t["type"] == "expense"]
+            if search_query.strip():
+                # Busca em todo o historico; os filtros valem sobre os resultados
+                results = [
+                    t for t in db.search_transactions(search_query)
+                    if (filter_category == "Todas" or t["category"] == filter_category)
+                    and filter_type in ("Todos", {"income": "Receitas", "expense": "Despesas"}[t["type"]])
+                ]
+                if not results:
+                    st.info("Nenhuma transacao encontrada.")
+                else:
+                    st.caption(f"{len(results)} resultados em todo o historico")
+                    for t in results:
+                        show_transaction_row(t)
+            else:
+                # Cursores (date, id) do inicio de cada pagina ja visitada;
+                # reinicia ao trocar mes, filtros ou tamanho da pagina
+                page_key = (selected_month, filter_category, filter_type, page_size)
+                if st.session_state.get("transactions_page_key") != page_key:
+                    st.session_state.transactions_page_key = page_key
+                    st.session_state.transactions_cursors = [None]
+                cursors = st.session_state.transactions_cursors
             
-            filtered_transactions.sort(key=lambda x: x["date"], reverse=True)
+                page_transactions, next_cursor = db.load_transactions_page(
+                    *get_month_range(selected_month, selected_month),
+                    cursor=cursors[-1],
+                    limit=page_size,
+                    category=None if filter_category == "Todas" else filter_category,
+                    tipo={"Receitas": "income", "Despesas": "expense"}.get(filter_type)
+                )
             
-            if not filtered_transactions:
-                st.info("Nenhuma transacao neste mes.")
-            else:
-                for t in filtered_transactions:
-                    with st.container():
-                        col_info, col_actions = st.columns([3, 1])
-                        
-                        with col_info:
-                            tipo_emoji = "🟢" if t["type"] == "income" else "🔴"
-                            st.markdown(f"""
-                            **{tipo_emoji} {t['description']}**  
-                            {format_currency(t['amount'])} - {t['date']}  
-                            `{t['category']}`
-                            """)
-                        
-                        with col_actions:
-                            col_edit, col_delete = st.columns(2)
-                            with col_edit:
-                                if st.button("✏️", key=f"edit_{t['id']}", help="Editar"):
-                                    st.session_state.editing_transaction = t
-                                    st.rerun()
-                            with col_delete:
-                                if st.button("🗑️", key=f"del_{t['id']}", help="Excluir"):
-                                    db.delete_transaction(t["id"])
-                                    st.rerun()
-                        
-                        st.divider()
+                if not page_transactions and len(cursors) == 1:
+                    st.info("Nenhuma transacao neste mes.")
+                else:
+                    for t in page_transactions:
+                        show_transaction_row(t)
+                
+                    col_prev, col_page, col_next = st.columns(3)
+                    with col_prev:
+                        if st.button("← Anterior", disabled=len(cursors) == 1, use_container_width=True):
+                            cursors.pop()
+                            st.rerun()
+                    with col_page:
+                        st.caption(f"Pagina {len(cursors)}")
+                    with col_next:
+                        if st.button("Proxima →", disabled=next_cursor is None, use_container_width=True):
+                            cursors.append(next_cursor)
+                            st.rerun()
     
     # Tab Metas
     with tab_metas:
-        transactions = db.load_transactions()
-        goal = db.load_goal()
+        monthly_index = db.load_monthly_index(window_start, window_end)
+        goal = dashboard["goal"]
         
         col_goal_form, col_goal_progress = st.columns(2)
         
@@ -533,7 +731,7 @@ def show_main_app():
             st.subheader("Progresso")
             
             target = float(goal.get("amount", 0))
-            totals = get_monthly_totals(transactions, selected_month)
+            totals = monthly_index.totals(selected_month)
             current = max(totals["balance"], 0)
             
             if target > 0:
@@ -557,7 +755,7 @@ def show_main_app():
     
     # Tab Lembretes
     with tab_lembretes:
-        reminders = db.load_reminders()
+        reminders = dashboard["reminders"]
         
         col_reminder_form, col_reminder_list = st.columns(2)
         
@@ -589,6 +787,15 @@ def show_main_app():
                     placeholder="Ex: pagar via boleto"
                 )
                 
+                # Repeticao so com a coluna recurrence (no Supabase, migracao 003)
+                reminder_recurrence = None
+                if db.supports_reminder_column("recurrence"):
+                    reminder_recurrence = st.selectbox(
+                        "Repeticao",
+                        list(RECURRENCE_LABELS),
+                        format_func=RECURRENCE_LABELS.get
+                    )
+                
                 if st.form_submit_button("Salvar Lembrete", use_container_width=True, type="primary"):
                     if reminder_name:
                         reminder = {
@@ -596,7 +803,8 @@ def show_main_app():
                             "name": reminder_name.strip(),
                             "amount": reminder_amount,
                             "dueDate": reminder_due.strftime("%Y-%m-%d"),
-                            "notes": reminder_notes.strip()
+                            "notes": reminder_notes.strip(),
+                            "recurrence": reminder_recurrence
                         }
                         db.save_reminder(reminder)
                         st.rerun()
@@ -604,40 +812,58 @@ def show_main_app():
         with col_reminder_list:
             st.subheader("Contas a Pagar")
             
-            if not reminders:
-                st.info("Nenhum lembrete cadastrado.")
+            reminder_query = st.text_input(
+                "🔎 Buscar",
+                placeholder="Nome ou observacao (ex: luz)",
+                key="reminder_search"
+            )
+            found = None
+            if reminder_query.strip():
+                found = set(SearchIndex.from_records(reminders, ("name", "notes")).search(reminder_query, None))
+            
+            if not reminders or found == set():
+                st.info("Nenhum lembrete encontrado." if reminder_query.strip() else "Nenhum lembrete cadastrado.")
             else:
-                sorted_reminders = sorted(reminders, key=lambda x: x["dueDate"])
-                today = date.today()
+                # Recorrentes aparecem do inicio do mes ate REMINDER_HORIZON_DAYS a frente;
+                # a agenda e reaproveitada entre reruns e a busca so filtra o resultado
+                agenda = db.get_reminder_schedule(reminders).agenda(date.today(), REMINDER_HORIZON_DAYS)
+                statuses = (
+                    ("overdue", "🔴 Vencido"),
+                    ("due_soon", "🟡 Vence em breve"),
+                    ("ok", "🟢 Em dia"),
+                    ("later", "⚪ Mais adiante")
+                )
                 
-                for r in sorted_reminders:
-                    due_date = datetime.strptime(r["dueDate"], "%Y-%m-%d").date()
-                    diff_days = (due_date - today).days
-                    
-                    if diff_days < 0:
-                        status = "🔴 Vencido"
-                    elif diff_days <= 7:
-                        status = "🟡 Vence em breve"
-                    else:
-                        status = "🟢 Em dia"
-                    
-                    with st.container():
-                        col_info, col_del = st.columns([4, 1])
-                        
-                        with col_info:
-                            amount_str = f" - {format_currency(r['amount'])}" if r['amount'] else ""
-                            st.markdown(f"""
-                            **{r['name']}** {status}  
-                            📅 {r['dueDate']}{amount_str}  
-                            _{r.get('notes', 'Sem observacoes') or 'Sem observacoes'}_
-                            """)
-                        
-                        with col_del:
-                            if st.button("🗑️", key=f"del_rem_{r['id']}", help="Excluir"):
-                                db.delete_reminder(r["id"])
-                                st.rerun()
-                        
-                        st.divider()
+                for bucket, status in statuses:
+                    for due_date, r in agenda[bucket]:
+                        if found is not None and r["id"] not in found:
+                            continue
+                        with st.container():
+                            col_info, col_paid, col_del = st.columns([4, 1, 1])
+                            
+                            with col_info:
+                                amount_str = f" - {format_currency(r['amount'])}" if r['amount'] else ""
+                                repeat_str = f" 🔁 {RECURRENCE_LABELS[r['recurrence']]}" if r.get("recurrence") in RECURRENCES else ""
+                                st.markdown(f"""
+                                **{r['name']}** {status}  
+                                📅 {due_date.isoformat()}{amount_str}{repeat_str}  
+                                _{r.get('notes', 'Sem observacoes') or 'Sem observacoes'}_
+                                """)
+                            
+                            # Recorrente: pagar a ocorrencia tira ela (e as anteriores) da agenda
+                            if repeat_str and bucket != "later" and db.supports_reminder_column("paidUntil"):
+                                with col_paid:
+                                    if st.button("✅", key=f"paid_rem_{r['id']}_{due_date.isoformat()}", help="Marcar como paga"):
+                                        db.mark_reminder_paid(r, due_date)
+                                        st.rerun()
+                            
+                            with col_del:
+                                help_text = "Excluir (todas as repeticoes)" if repeat_str else "Excluir"
+                                if st.button("🗑️", key=f"del_rem_{r['id']}_{due_date.isoformat()}", help=help_text):
+                                    db.delete_reminder(r["id"])
+                                    st.rerun()
+                            
+                            st.divider()
 
 
 # =============================================================================
@@ -646,8 +872,8 @@ def show_main_app():
 def main():
     """Funcao principal - roteia entre login e app"""
     
-    # Se nao esta no modo cloud, mostra aviso
-    if db.get_mode() != "cloud":
+    # Sem banco com autenticacao (Supabase ou SQLite), mostra aviso
+    if db.get_mode() == "local":
         st.warning("⚠️ Modo local ativo. Configure o Supabase para ter autenticacao e dados na nuvem.")
         show_main_app_local()
         return
@@ -655,6 +881,12 @@ def main():
     # Verifica se usuario esta logado
     user = get_current_user()
     
+    if user and not db.has_session():
+        # Sessao perdida no servidor (reinicio ou limite de sessoes): pede novo login
+        db.sign_out()
+        st.warning("Sua sessao expirou. Entre novamente.")
+        user = None
+    
     if user:
         show_main_app()
     else:
@@ -663,6 +895,8 @@ def main():
 
 def show_main_app_local():
     """Versao simplificada para modo local (sem auth)"""
+    db.begin_rerun()
+    
     st.markdown('<h1 class="main-header">Controle Financeiro</h1>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Organize seus gastos com facilidade.</p>', unsafe_allow_html=True)
     
@@ -695,8 +929,8 @@ def show_main_app_local():
     ])
     
     with tab_resumo:
-        transactions = db.load_transactions()
-        totals = get_monthly_totals(transactions, selected_month)
+        monthly_index = db.load_monthly_index(*get_month_range(selected_month, selected_month))
+        totals = monthly_index.totals(selected_month)
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -0,0 +1,112 @@
+"""
+Dados sinteticos para os benchmarks.
+
+As transacoes sao deterministicas (mesma semente, mesmos dados), espalhadas
+por varios meses terminando no mes atual e por todas as categorias do app,
+com descricoes parecidas com as de um extrato real. Assim duas execucoes em
+commits diferentes medem exatamente o mesmo conjunto.
+
+Uso:
+    python benchmarks/datagen.py 100k data.json
+"""
+
+import argparse
+import json
+import random
+import uuid
+from datetime import date
+from pathlib import Path
+
+from dateutil.relativedelta import relativedelta
+
+# Tamanhos padrao dos conjuntos (nome -> quantidade de transacoes)
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+# Meses cobertos pelas transacoes (o ultimo e o mes atual)
+MONTHS = 60
+
+SEED = 20240101
+
+# Mesmas categorias do app, com palavras tipicas das descricoes
+DESCRIPTIONS = {
+    "Alimentacao": ["Mercado", "Padaria", "iFood", "Restaurante", "Acougue", "Hortifruti"],
+    "Transporte": ["Uber", "Posto Shell", "Gasolina", "Metro", "Estacionamento", "99 Taxi"],
+    "Moradia": ["Aluguel", "Condominio", "Conta de luz", "Agua e esgoto", "Internet", "IPTU"],
+    "Saude": ["Farmacia", "Drogasil", "Consulta", "Plano de saude", "Laboratorio"],
+    "Lazer": ["Cinema", "Netflix", "Spotify", "Show", "Viagem", "Livraria"],
+    "Educacao": ["Curso online", "Mensalidade escola", "Material escolar", "Udemy"],
+    "Outros": ["Pix enviado", "Presente", "Tarifa bancaria", "Doacao"]
+}
+
+# Receitas (sempre na categoria Outros)
+INCOME_DESCRIPTIONS = ["Salario", "Freelance", "Reembolso", "Rendimento poupanca", "Pix recebido"]
+
+# Fracao das transacoes que sao receitas
+INCOME_SHARE = 0.15
+
+
+def month_starts(months, last_month=None):
+    """Primeiro dia de cada um dos meses, do mais antigo ao last_month (padrao: mes atual)"""
+    last = last_month or date.today().replace(day=1)
+    return [last - relativedelta(months=offset) for offset in range(months - 1, -1, -1)]
+
+
+def generate_transactions(count, months=MONTHS, seed=SEED, last_month=None):
+    """Gera count transacoes no formato do app, distribuidas igualmente pelos meses"""
+    rng = random.Random(seed)
+    starts = month_starts(months, last_month)
+    categories = list(DESCRIPTIONS)
+    transactions = []
+    for i in range(count):
+        start = starts[i % months]
+        when = start.replace(day=rng.randint(1, 28))
+        if rng.random() < INCOME_SHARE:
+            tipo, category = "income", "Outros"
+            description = rng.choice(INCOME_DESCRIPTIONS)
+            amount = rng.uniform(200, 8000)
+        else:
+            tipo, category = "expense", rng.choice(categories)
+            description = rng.choice(DESCRIPTIONS[category])
+            amount = rng.uniform(5, 600)
+        transactions.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "type": tipo,
+            "amount": round(amount, 2),
+            "date": when.isoformat(),
+            "category": category,
+            "description": f"{description} {rng.randint(1, 999)}"
+        })
+    return transactions
+
+
+def generate_data(count, months=MONTHS, seed=SEED):
+    """Conteudo completo de um data.json (transacoes, meta, lembretes e recorrentes)"""
+    today = date.today()
+    return {
+        "transactions": generate_transactions(count, months, seed),
+        "goal": {"amount": 1500.0},
+        "reminders": [
+            {"id": f"reminder-{i}", "name": name, "amount": amount,
+             "dueDate": today.replace(day=day).isoformat(), "notes": "", "recurrence": "monthly"}
+            for i, (name, amount, day) in enumerate([("Aluguel", 1800.0, 5), ("Luz", 180.0, 12), ("Internet", 99.9, 20)])
+        ],
+        "recurring": []
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("size", help=f"quantidade de transacoes ou um de: {', '.join(SIZES)}")
+    parser.add_argument("output", help="arquivo data.json a gravar")
+    parser.add_argument("--months", type=int, default=MONTHS, help="meses cobertos")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    count = SIZES[args.size] if args.size in SIZES else int(args.size)
+    data = generate_data(count, args.months, args.seed)
+    Path(args.output).write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    print(f"{count} transacoes em {args.months} meses gravadas em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Servidor HTTP local que imita o PostgREST do Supabase (/rest/v1).
+
+Atende o subconjunto que o database.py usa: select com filtros (eq, neq,
+gt, gte, lt, lte, in, ilike, is), order e limit; upsert (POST); delete
+com filtros; e a RPC dashboard_totals. Os dados ficam em memoria, entao o
+modo cloud pode ser medido sem rede e sem projeto Supabase: o tempo medido
+e o do cliente (HTTP, JSON, cache, consultas em paralelo). latency simula
+o tempo de ida e volta de uma rede real.
+
+O tempo gasto pelo proprio servidor em cada requisicao e somado em
+busy_seconds, para ser descontado das medicoes.
+
+Uso (para apontar o app para ele: SUPABASE_URL = "http://127.0.0.1:54321"):
+    python benchmarks/postgrest_stub.py --rows 100k --port 54321 --user-id <id>
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+OPERATORS = {
+    "eq": lambda value, arg: value is not None and str(value) == arg,
+    "neq": lambda value, arg: value is None or str(value) != arg,
+    "gt": lambda value, arg: value is not None and str(value) > arg,
+    "gte": lambda value, arg: value is not None and str(value) >= arg,
+    "lt": lambda value, arg: value is not None and str(value) < arg,
+    "lte": lambda value, arg: value is not None and str(value) <= arg,
+}
+
+# Parametros da URL que nao sao filtros de coluna
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+# Filtros resolvidos pelos indices da Table (nao precisam ser testados linha a linha)
+INDEXED_FILTERS = {("id", "eq"), ("id", "in"), ("date", "gte"), ("date", "lt")}
+
+
+class StubError(Exception):
+    """Erro devolvido no formato do PostgREST ({code, message})"""
+
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+def like_pattern(pattern):
+    """Converte padrao ILIKE (* ou %) em regex sem diferenciar maiusculas"""
+    parts = re.split(r"[*%]", pattern)
+    return re.compile(".*".join(re.escape(part) for part in parts), re.IGNORECASE | re.DOTALL)
+
+
+def parse_filter(column, expression):
+    """Converte 'coluna=op.valor' em funcao linha -> bool"""
+    operator, _, arg = expression.partition(".")
+    if operator in OPERATORS:
+        compare = OPERATORS[operator]
+        return lambda row: compare(row.get(column), arg)
+    if operator == "in":
+        values = {value.strip('"') for value in arg.strip("()").split(",")}
+        return lambda row: str(row.get(column)) in values
+    if operator == "ilike":
+        regex = like_pattern(arg)
+        return lambda row: row.get(column) is not None and regex.fullmatch(str(row[column])) is not None
+    if operator == "is" and arg == "null":
+        return lambda row: row.get(column) is None
+    raise StubError(400, "PGRST100", f"filtro nao suportado pelo stub: {column}={expression}")
+
+
+class Table:
+    """Linhas de uma tabela por id, com indice ordenado por data (intervalos sem varrer tudo)"""
+
+    def __init__(self, rows=()):
+        self.rows = {row["id"]: dict(row) for row in rows}
+        # [(date, id)] ordenado; montado de uma vez (insort linha a linha seria quadratico)
+        self.by_date = sorted((row["date"], row_id) for row_id, row in self.rows.items() if row.get("date") is not None)
+
+    def upsert(self, row):
+        old = self.rows.get(row["id"])
+        merged = {**old, **row} if old else dict(row)
+        if old and old.get("date") is not None:
+            del self.by_date[bisect_left(self.by_date, (old["date"], row["id"]))]
+        if merged.get("date") is not None:
+            insort(self.by_date, (merged["date"], row["id"]))
+        self.rows[row["id"]] = merged
+        return merged
+
+    def delete(self, row_id):
+        row = self.rows.pop(row_id)
+        if row.get("date") is not None:
+            del self.by_date[bisect_left(self.by_date, (row["date"], row_id))]
+        return row
+
+    def candidates(self, params):
+        """Linhas pelos ids ou pelo intervalo de datas dos filtros (todas se nao houver)"""
+        low = high = None
+        for column, expression in params:
+            operator, _, arg = expression.partition(".")
+            if (column, operator) == ("id", "eq"):
+                return [self.rows[arg]] if arg in self.rows else []
+            if (column, operator) == ("id", "in"):
+                ids = (value.strip('"') for value in arg.strip("()").split(","))
+                return [self.rows[row_id] for row_id in ids if row_id in self.rows]
+            if (column, operator) == ("date", "gte"):
+                low = arg
+            elif (column, operator) == ("date", "lt"):
+                high = arg
+        if low is None and high is None:
+            return list(self.rows.values())
+        first = bisect_left(self.by_date, (low,)) if low else 0
+        last = bisect_left(self.by_date, (high,)) if high else len(self.by_date)
+        return [self.rows[row_id] for _, row_id in self.by_date[first:last]]
+
+    def select(self, params):
+        """Linhas que passam em todos os filtros da URL"""
+        filters = [
+            parse_filter(column, expression) for column, expression in params
+            if column not in RESERVED_PARAMS and (column, expression.partition(".")[0]) not in INDEXED_FILTERS
+        ]
+        return [row for row in self.candidates(params) if all(check(row) for check in filters)]
+
+
+def dashboard_totals(table, start_date=None, end_date=None):
+    """Mesma saida da funcao SQL dashboard_totals (migrations/001)"""
+    params = [("date", f"gte.{start_date}")] if start_date else []
+    if end_date:
+        params.append(("date", f"lt.{end_date}"))
+    totals = {}
+    for row in table.candidates(params):
+        key = (row["date"][:7], row["type"], row["category"])
+        total, count = totals.get(key, (0.0, 0))
+        totals[key] = (total + float(row["amount"]), count + 1)
+    return [
+        {"month": month, "type": tipo, "category": category, "total": total, "count": count}
+        for (month, tipo, category), (total, count) in totals.items()
+    ]
+
+
+# RPCs atendidas (as demais respondem como funcao inexistente, e o app usa o fallback)
+RPCS = {"dashboard_totals": lambda tables, body: dashboard_totals(tables["transactions"], **body)}
+
+
+class PostgrestStub(ThreadingHTTPServer):
+    """Servidor com as tabelas em memoria; usar start() para rodar em segundo plano"""
+
+    daemon_threads = True
+
+    def __init__(self, tables=None, latency=0.0, port=0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.tables = {name: Table(rows) for name, rows in (tables or {}).items()}
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def table(self, name):
+        return self.tables.setdefault(name, Table())
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stats(self):
+        with self.lock:
+            return {"requests": self.requests, "busy_seconds": self.busy_seconds}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive: o pool HTTP do app reaproveita as conexoes como faria com o Supabase
+    protocol_version = "HTTP/1.1"
+    # Cabecalho e corpo saem em escritas separadas: com Nagle cada resposta esperaria o ACK atrasado (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request(lambda table, params, body: self.select(table, params))
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        self.handle_request(self.post)
+
+    def do_PATCH(self):
+        self.handle_request(self.patch)
+
+    def do_DELETE(self):
+        self.handle_request(self.delete)
+
+    def handle_request(self, action):
+        started = time.perf_counter()
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        url = urlsplit(self.path)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        try:
+            match = re.fullmatch(r"/rest/v1/(rpc/)?([\w-]+)", unquote(url.path))
+            if match is None:
+                raise StubError(404, "PGRST404", f"rota nao suportada pelo stub: {url.path}")
+            body = json.loads(raw) if raw else None
+            with self.server.lock:
+                if match.group(1):
+                    status, payload = self.rpc(match.group(2), body or {})
+                else:
+                    status, payload = action(self.server.table(match.group(2)), params, body)
+        except StubError as e:
+            status, payload = e.status, {"code": e.code, "message": str(e), "details": None, "hint": None}
+        data = json.dumps(payload).encode()
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.busy_seconds += time.perf_counter() - started
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def rpc(self, name, body):
+        if name not in RPCS:
+            raise StubError(404, "PGRST202", f"Could not find the function public.{name}")
+        return 200, RPCS[name](self.server.tables, body)
+
+    def select(self, table, params):
+        rows = table.select(params)
+        options = dict(params)
+        for key in reversed(options.get("order", "").split(",") if options.get("order") else []):
+            column, _, direction = key.partition(".")
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction.startswith("desc"))
+        offset = int(options.get("offset", 0))
+        if "limit" in options:
+            rows = rows[offset:offset + int(options["limit"])]
+        elif offset:
+            rows = rows[offset:]
+        columns = options.get("select", "*")
+        if columns != "*":
+            names = [name.strip() for name in columns.split(",")]
+            rows = [{name: row.get(name) for name in names} for row in rows]
+        return 200, rows
+
+    def post(self, table, params, body):
+        rows = body if isinstance(body, list) else [body]
+        return 201, [table.upsert(row) for row in rows]
+
+    def patch(self, table, params, body):
+        return 200, [table.upsert({**row, **body}) for row in table.select(params)]
+
+    def delete(self, table, params, body):
+        return 200, [table.delete(row["id"]) for row in table.select(params)]
+
+
+def main():
+    import datagen
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1k", help=f"transacoes geradas ({', '.join(datagen.SIZES)} ou numero)")
+    parser.add_argument("--user-id", default="benchmark-user", help="dono das transacoes geradas")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="atraso de rede simulado por requisicao")
+    args = parser.parse_args()
+
+    count = datagen.SIZES[args.rows] if args.rows in datagen.SIZES else int(args.rows)
+    rows = [dict(t, user_id=args.user_id) for t in datagen.generate_transactions(count)]
+    server = PostgrestStub({"transactions": rows}, args.latency_ms / 1000, args.port)
+    print(f"PostgREST simulado em {server.url} com {count} transacoes (Ctrl+C para sair)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de tempo ate a primeira renderizacao (cold start).
+
+Cada cenario roda em um processo Python novo, para que o custo de importar
+streamlit, plotly e supabase entre na medicao, e em uma copia temporaria do
+app, para nao tocar nos dados reais (data.json / financeiro.db).
+
+Cenarios:
+    auth       - tela de login (modo cloud configurado, usuario deslogado)
+    local      - modo local (JSON)
+    dashboard  - dashboard logado (modo SQLite, com transacoes de exemplo)
+
+Uso:
+    python benchmarks/startup.py [--runs 5] [--json resultados.json]
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_FILES = ["app.py", "database.py", "aggregates.py", "analytics.py", "reminders.py", "recurring.py", "search.py", "categorizer.py", "importer.py"]
+
+SCENARIOS = {
+    "auth": {
+        "SUPABASE_URL": "http://127.0.0.1:9",
+        "SUPABASE_KEY": "benchmark.fake.key"
+    },
+    "local": {},
+    "dashboard": {
+        "DATABASE_BACKEND": "sqlite"
+    }
+}
+
+# Executado no processo filho: mede apenas a primeira execucao do script
+CHILD = """
+import json, sys, time
+from types import SimpleNamespace
+from streamlit.testing.v1 import AppTest
+
+app_file, scenario, secrets = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+at = AppTest.from_file(app_file, default_timeout=120)
+for name, value in secrets.items():
+    at.secrets[name] = value
+
+if scenario == "dashboard":
+    import database
+    conn = database.get_sqlite_connection()
+    user = SimpleNamespace(id="benchmark-user", email="benchmark@example.com")
+    database.save_transactions_sqlite(conn, [
+        {"id": f"t{i}", "type": "income" if i % 5 == 0 else "expense", "amount": 10.0 + i,
+         "date": f"{time.strftime('%Y-%m')}-{(i % 28) + 1:02d}", "category": "Outros",
+         "description": f"Transacao {i}"}
+        for i in range(200)
+    ], user.id)
+    at.session_state["user"] = user
+
+start = time.perf_counter()
+at.run()
+elapsed = time.perf_counter() - start
+if at.exception:
+    raise SystemExit(f"erro no cenario {scenario}: {at.exception[0].value}")
+# plotly.io e carregado pelo proprio streamlit (tema); o custo do app esta em plotly.express
+print(json.dumps({"seconds": elapsed, "modules": sorted(m for m in ("plotly.express", "supabase") if m in sys.modules)}))
+"""
+
+
+def run_scenario(scenario: str, secrets: dict) -> dict:
+    """Roda um cenario em diretorio e processo novos e retorna o tempo medido"""
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in APP_FILES:
+            shutil.copy(ROOT / name, workdir)
+        # Sem SQLITE_PATH o banco padrao fica na copia temporaria (mesmo para o processo filho)
+        app_file = str(Path(workdir) / "app.py")
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD, app_file, scenario, json.dumps(secrets)],
+            cwd=workdir, capture_output=True, text=True, check=True
+        )
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="execucoes por cenario")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help="cenarios a rodar")
+    args = parser.parse_args()
+
+    results = {}
+    for scenario in args.scenarios:
+        runs = [run_scenario(scenario, SCENARIOS[scenario]) for _ in range(args.runs)]
+        times = [r["seconds"] for r in runs]
+        results[scenario] = {
+            "median_s": statistics.median(times),
+            "min_s": min(times),
+            "max_s": max(times),
+            "heavy_modules_loaded": runs[-1]["modules"]
+        }
+        print(f"{scenario:10s} mediana {results[scenario]['median_s'] * 1000:8.1f} ms  "
+              f"(min {min(times) * 1000:.1f}, max {max(times) * 1000:.1f})  "
+              f"modulos pesados: {', '.join(runs[-1]['modules']) or 'nenhum'}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
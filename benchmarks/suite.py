@@ -0,0 +1,312 @@
+"""
+Benchmark do database.py e das agregacoes do painel.
+
+Para cada tamanho de conjunto (ver datagen.SIZES) e cada modo, roda um
+processo Python novo em uma copia temporaria do app (como startup.py), para
+nao tocar nos dados reais e para que um tamanho nao herde cache do outro.
+
+Medicoes:
+    local  - load_local_data (frio e com cache) e save_local_data do data.json;
+             Database.save_transaction / delete_transaction (por operacao);
+             get_monthly_totals, montagem das colunas, gastos por categoria,
+             os seis meses do grafico (um get_monthly_totals por mes e
+             TransactionColumns.series) e o painel completo (load_dashboard)
+             frio, com cache e num rerun sem escritas (snapshot da sessao)
+    cloud  - o mesmo painel, transacoes do mes e save/delete contra o
+             PostgREST simulado (postgrest_stub.py); server_s e o tempo do
+             proprio servidor, que nao e do app
+
+Os resultados vao para um JSON ({tamanho: {modo: {medicao: tempos}}}) para
+comparar commits: rode antes e depois e compare os arquivos com --compare.
+
+Uso:
+    python benchmarks/suite.py [--sizes 1k 100k 1m] [--modes local cloud] [--runs 3]
+                               [--ops 100] [--latency-ms 0] [--json resultados.json]
+                               [--compare anterior.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import datagen
+from startup import APP_FILES, ROOT
+
+MODES = ["local", "cloud"]
+
+# Meses do grafico de tendencia medido (o menor periodo do app)
+CHART_MONTHS = 6
+
+# Usuario dono dos dados no modo cloud
+BENCHMARK_USER = "benchmark-user"
+
+# Variacao (mediana nova / anterior) a partir da qual --compare destaca a medicao
+REGRESSION_RATIO = 1.2
+
+
+def summarize(times: list) -> dict:
+    """Mediana, minimo, maximo e p95 de uma lista de tempos (segundos)"""
+    ordered = sorted(times)
+    return {
+        "median_s": statistics.median(ordered),
+        "min_s": ordered[0],
+        "max_s": ordered[-1],
+        "p95_s": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "runs": len(ordered)
+    }
+
+
+def timed(action, runs: int, setup=None) -> dict:
+    """Executa action() runs vezes (setup() antes de cada uma, fora da medicao)"""
+    times = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        action()
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+def timed_each(action, items: list) -> dict:
+    """Mede action(item) para cada item (tempos por operacao)"""
+    times = []
+    for item in items:
+        start = time.perf_counter()
+        action(item)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+# =============================================================================
+# Processo filho (roda dentro da copia do app)
+# =============================================================================
+
+def chart_window():
+    """(mes atual, primeiro mes do grafico, meses do grafico, inicio, fim) como no app"""
+    from aggregates import add_months, get_month_range
+    from analytics import month_list
+
+    month = date.today().strftime("%Y-%m")
+    first = add_months(month, -(CHART_MONTHS - 1))
+    return month, first, month_list(first, month), *get_month_range(first, month)
+
+
+def dashboard_rerun(db, window):
+    """O que um rerun do Resumo calcula: painel, totais do mes, categorias e tendencia"""
+    from analytics import MonthlyTrends
+
+    month, first, _, start, end = window
+    dashboard = db.load_dashboard(start, end)
+    index = dashboard["monthly_index"]
+    index.totals(month)
+    index.category_totals(month, "expense")
+    MonthlyTrends.from_index(index, first, month).totals("expense")
+
+
+def bench_local(count: int, options: dict) -> dict:
+    import database
+    from aggregates import TransactionColumns, get_monthly_totals
+
+    runs = options["runs"]
+    window = month, _, months, _, _ = chart_window()
+    data = datagen.generate_data(count)
+    transactions = data["transactions"]
+
+    def drop_local_cache():
+        # Como um processo novo: o proximo acesso rele o data.json do disco
+        database.LOCAL_CACHE.update(data_stamp=None, journal_stamp=None, state=None, columns=None, search=None)
+
+    results = {
+        "save_local_data": timed(lambda: database.save_local_data(data), runs),
+        "load_local_data_cold": timed(database.load_local_data, runs, drop_local_cache),
+        "load_local_data_cached": timed(database.load_local_data, runs)
+    }
+
+    db = database.Database()
+    new_rows = datagen.generate_transactions(options["ops"], seed=datagen.SEED + 1)
+    results["save_transaction"] = timed_each(db.save_transaction, new_rows)
+    results["delete_transaction"] = timed_each(db.delete_transaction, [t["id"] for t in new_rows])
+
+    columns = TransactionColumns.from_transactions(transactions)
+    results.update({
+        "get_monthly_totals": timed(lambda: get_monthly_totals(transactions, month), runs),
+        "columns_build": timed(lambda: TransactionColumns.from_transactions(transactions), runs),
+        "category_breakdown": timed(lambda: columns.category_totals(month, "expense"), runs),
+        "chart_six_months_loop": timed(lambda: [get_monthly_totals(columns, m) for m in months], runs),
+        "chart_six_months_series": timed(lambda: columns.series(months), runs)
+    })
+
+    def cold_rerun():
+        database.reset_snapshot()
+        database.LOCAL_CACHE["columns"] = None
+
+    results["dashboard_cold"] = timed(lambda: dashboard_rerun(db, window), runs, cold_rerun)
+    dashboard_rerun(db, window)
+    results["dashboard_cached"] = timed(lambda: dashboard_rerun(db, window), runs, database.reset_snapshot)
+    results["dashboard_rerun"] = timed(lambda: dashboard_rerun(db, window), runs, db.begin_rerun)
+    return results
+
+
+def bench_cloud(count: int, options: dict) -> dict:
+    from types import SimpleNamespace
+
+    from postgrest_stub import PostgrestStub
+
+    # Mesmos dados do modo local; meta e lembretes vazios nao entrariam no cache do app
+    data = datagen.generate_data(count)
+    data["goal"].update(id=BENCHMARK_USER)
+    server = PostgrestStub({
+        table: [dict(row, user_id=BENCHMARK_USER) for row in rows]
+        for table, rows in [("transactions", data["transactions"]), ("goals", [data["goal"]]), ("reminders", data["reminders"])]
+    }, options["latency_ms"] / 1000).start()
+    del data
+    # Os secrets precisam existir antes do primeiro acesso a st.secrets
+    secrets = Path(".streamlit")
+    secrets.mkdir(exist_ok=True)
+    (secrets / "secrets.toml").write_text(
+        f'SUPABASE_URL = "{server.url}"\nSUPABASE_KEY = "benchmark.fake.key"\n'
+        # Sem a fila local: save/delete medem a ida e volta ao servidor
+        'OUTBOX = false\n',
+        encoding="utf-8"
+    )
+
+    import streamlit as st
+    import database
+    from aggregates import get_month_range
+
+    st.session_state["user"] = SimpleNamespace(id=BENCHMARK_USER, email="benchmark@example.com")
+    db = database.Database()
+    if not db.is_cloud:
+        raise SystemExit("modo cloud nao iniciou (supabase instalado?)")
+    # O servidor simulado nao confere o token: um cliente sem login faz o papel da sessao
+    db.pool.register(database.get_session_id(), BENCHMARK_USER, db.pool.new_client())
+    runs = options["runs"]
+    window = month, *_ = chart_window()
+
+    def cold_rerun():
+        database.reset_snapshot()
+        db.cache = database.UserDataCache(*database.get_cache_settings())
+
+    def with_server_time(measure):
+        # Tempo gasto pelo servidor simulado durante a medicao, por execucao
+        before = server.stats()["busy_seconds"]
+        result = measure()
+        result["server_s"] = (server.stats()["busy_seconds"] - before) / result["runs"]
+        return result
+
+    new_rows = datagen.generate_transactions(options["ops"], seed=datagen.SEED + 1)
+    results = {"dashboard_cold": with_server_time(lambda: timed(lambda: dashboard_rerun(db, window), runs, cold_rerun))}
+    dashboard_rerun(db, window)
+    results.update({
+        "dashboard_cached": with_server_time(
+            lambda: timed(lambda: dashboard_rerun(db, window), runs, database.reset_snapshot)),
+        "dashboard_rerun": with_server_time(
+            lambda: timed(lambda: dashboard_rerun(db, window), runs, db.begin_rerun)),
+        "month_transactions": with_server_time(
+            lambda: timed(lambda: db.fetch_transactions(*get_month_range(month, month)), runs, cold_rerun)),
+        "save_transaction": with_server_time(lambda: timed_each(db.save_transaction, new_rows)),
+        "delete_transaction": with_server_time(
+            lambda: timed_each(db.delete_transaction, [t["id"] for t in new_rows]))
+    })
+    results["http_pool"] = db.pool.stats()
+    server.shutdown()
+    return results
+
+
+def run_child(mode: str, count: int, options: dict):
+    """Ponto de entrada do processo filho: imprime os resultados em JSON na ultima linha"""
+    sys.path.insert(0, os.getcwd())
+    results = bench_local(count, options) if mode == "local" else bench_cloud(count, options)
+    print(json.dumps(results))
+
+
+# =============================================================================
+# Processo principal
+# =============================================================================
+
+def run_mode(mode: str, count: int, options: dict) -> dict:
+    """Roda um modo em diretorio e processo novos e retorna as medicoes"""
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in APP_FILES:
+            shutil.copy(ROOT / name, workdir)
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", mode, str(count), json.dumps(options)],
+            cwd=workdir, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise SystemExit(f"erro no modo {mode} ({count} transacoes):\n{result.stderr[-4000:]}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, previous: dict):
+    """Imprime a variacao das medianas em relacao a um JSON anterior"""
+    print(f"\ncomparacao (nova / anterior; >= {REGRESSION_RATIO:.1f}x marcado com !)")
+    for size, modes in results["results"].items():
+        for mode, measures in modes.items():
+            old_measures = previous.get("results", {}).get(size, {}).get(mode, {})
+            for name, measure in measures.items():
+                old = old_measures.get(name)
+                if "median_s" not in measure or not old or not old.get("median_s"):
+                    continue
+                ratio = measure["median_s"] / old["median_s"]
+                flag = "!" if ratio >= REGRESSION_RATIO else " "
+                print(f"{flag} {size:5s} {mode:6s} {name:26s} {ratio:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=list(datagen.SIZES), help="tamanhos dos conjuntos")
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--runs", type=int, default=3, help="execucoes por medicao")
+    parser.add_argument("--ops", type=int, default=100, help="transacoes salvas e removidas uma a uma")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="atraso de rede simulado (modo cloud)")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--compare", help="JSON de uma execucao anterior para comparar")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, count, options = args.child
+        run_child(mode, int(count), json.loads(options))
+        return
+
+    options = {"runs": args.runs, "ops": args.ops, "latency_ms": args.latency_ms}
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    results = {
+        "commit": commit.stdout.strip() or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "results": {}
+    }
+    for size in args.sizes:
+        count = datagen.SIZES[size] if size in datagen.SIZES else int(size)
+        results["results"][size] = {}
+        for mode in args.modes:
+            measures = run_mode(mode, count, options)
+            results["results"][size][mode] = measures
+            for name, measure in measures.items():
+                if "median_s" not in measure:
+                    continue
+                server = f"  (servidor {measure['server_s'] * 1000:.2f} ms)" if "server_s" in measure else ""
+                print(f"{size:5s} {mode:6s} {name:26s} mediana {measure['median_s'] * 1000:10.2f} ms  "
+                      f"(min {measure['min_s'] * 1000:.2f}, p95 {measure['p95_s'] * 1000:.2f}){server}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Sugestao de categoria pela descricao da transacao.
+CategoryModel e um Naive Bayes multinomial treinado com o historico do
+proprio usuario (palavras da descricao -> categoria). O treino e apenas
+contagem, entao cada transacao salva atualiza o modelo na hora (learn); a
+inferencia em lote usa uma matriz de log-probabilidades NumPy, refeita so
+quando o modelo muda.
+A priori e uniforme: uma categoria com poucas transacoes nao perde so por
+ser rara, e um unico exemplo novo ja passa a ser sugerido. O tipo
+(receita/despesa) apenas limita as categorias ja vistas com ele.
+"""
+
+import numpy as np
+
+from search import tokenize
+
+# Suavizacao de Laplace das contagens
+ALPHA = 1.0
+
+# Transacoes minimas no historico antes de sugerir algo
+MIN_SAMPLES = 5
+
+
+class CategoryModel:
+    """Contagens por categoria e por (palavra, categoria)"""
+
+    def __init__(self):
+        self.categories = []       # codigo -> categoria
+        self.category_codes = {}   # categoria -> codigo
+        self.docs = []             # transacoes por categoria
+        self.token_totals = []     # palavras por categoria
+        self.token_counts = {}     # palavra -> {codigo: contagem}
+        self.type_docs = {}        # tipo -> transacoes por categoria
+        self.samples = 0
+        self.matrix = None         # (vocabulario, log P(palavra|c)) em cache
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        """Treina com transacoes {type, category, description}"""
+        model = cls()
+        for transaction in transactions:
+            model.learn(transaction)
+        return model
+
+    def learn(self, transaction, weight=1):
+        """Soma a transacao nas contagens (weight=-1 desfaz)"""
+        category = transaction.get("category")
+        if not category:
+            return
+        code = self.category_codes.get(category)
+        if code is None:
+            code = self.category_codes[category] = len(self.categories)
+            self.categories.append(category)
+            self.docs.append(0)
+            self.token_totals.append(0)
+            for docs in self.type_docs.values():
+                docs.append(0)
+        tokens = tokenize(transaction.get("description"))
+        self.docs[code] += weight
+        if transaction.get("type"):
+            docs = self.type_docs.setdefault(transaction["type"], [0] * len(self.categories))
+            docs[code] += weight
+        self.token_totals[code] += weight * len(tokens)
+        for token in tokens:
+            counts = self.token_counts.setdefault(token, {})
+            counts[code] = counts.get(code, 0) + weight
+        self.samples += weight
+        self.matrix = None
+
+    def ready(self):
+        """Indica se ha historico suficiente para sugerir"""
+        return self.samples >= MIN_SAMPLES and len(self.categories) > 1
+
+    def log_probabilities(self):
+        """
+        Retorna (vocabulario palavra -> linha, matriz de log P(palavra|categoria)).
+        A ultima linha da matriz e zero (preenchimento).
+        """
+        if self.matrix is None:
+            vocabulary = {token: row for row, token in enumerate(self.token_counts)}
+            counts = np.zeros((len(vocabulary) + 1, len(self.categories)))
+            for token, row in vocabulary.items():
+                for code, count in self.token_counts[token].items():
+                    counts[row, code] = count
+            totals = np.asarray(self.token_totals, dtype=np.float64) + ALPHA * len(vocabulary)
+            log_likelihood = np.log(counts + ALPHA) - np.log(totals)
+            log_likelihood[-1] = 0.0
+            self.matrix = (vocabulary, log_likelihood)
+        return self.matrix
+
+    def predict(self, description, tipo=None):
+        """Categoria mais provavel para a descricao, ou None sem evidencia"""
+        return self.predict_many([(description, tipo)])[0]
+
+    def predict_many(self, rows):
+        """
+        Categoria mais provavel de cada (descricao, tipo), em lote: cada linha e
+        uma soma de linhas da matriz (np.add.reduceat). None quando o modelo
+        ainda nao tem historico ou nenhuma palavra da descricao e conhecida.
+        """
+        rows = list(rows)
+        if not rows or not self.ready():
+            return [None] * len(rows)
+        vocabulary, log_likelihood = self.log_probabilities()
+        padding = len(vocabulary)
+        indices = []
+        offsets = []
+        for description, _ in rows:
+            offsets.append(len(indices))
+            indices.extend([vocabulary[t] for t in tokenize(description) if t in vocabulary] or [padding])
+        scores = np.add.reduceat(log_likelihood[indices], offsets, axis=0)
+        # Categorias nunca vistas com o tipo da linha ficam de fora
+        tipos = [tipo for _, tipo in rows]
+        for tipo, docs in self.type_docs.items():
+            unseen = np.asarray(docs) <= 0
+            if unseen.any():
+                scores[np.ix_([t == tipo for t in tipos], unseen)] = -np.inf
+        best = scores.argmax(axis=1)
+        # Sem nenhuma palavra conhecida (so o preenchimento) nao ha sugestao
+        known = np.asarray(indices)[offsets] != padding
+        return [self.categories[code] if ok else None for code, ok in zip(best.tolist(), known.tolist())]
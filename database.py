@@ -1,25 +1,89 @@
 """
 Modulo de conexao com Supabase para persistencia de dados.
 Suporta autenticacao de usuarios e dados privados por usuario.
-Fallback para arquivo JSON local quando Supabase nao esta configurado.
+Modo SQLite embarcado (DATABASE_BACKEND = "sqlite") para instalacoes proprias.
+Fallback para arquivo JSON local quando Supabase nao esta configurado
+(data.json compactado + log de operacoes data.journal).
 """
 
 import streamlit as st
+import importlib.util
 import json
+import os
+import random
+import sqlite3
+import hashlib
+import heapq
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from pathlib import Path
+from types import SimpleNamespace
 
-# Tenta importar supabase
-try:
-    from supabase import create_client, Client
-    SUPABASE_AVAILABLE = True
-except ImportError:
-    SUPABASE_AVAILABLE = False
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from aggregates import MonthlyIndex, TransactionColumns, aggregate_transactions
+from categorizer import CategoryModel
+from recurring import materialize, project_rows
+from reminders import ReminderSchedule
+from search import SEARCH_LIMIT, SearchIndex, matches
+
+# Verifica se supabase esta instalado sem importar: o pacote e pesado e so e
+# carregado quando o modo cloud esta configurado (ver get_supabase_client)
+SUPABASE_AVAILABLE = importlib.util.find_spec("supabase") is not None
 
 DATA_FILE = Path(__file__).parent / "data.json"
+# Log de operacoes (uma linha JSON por escrita) aplicado sobre o data.json
+JOURNAL_FILE = Path(__file__).parent / "data.journal"
+# Tamanho minimo do log para disparar a compactacao no data.json
+JOURNAL_MAX_BYTES = 256 * 1024
+# Sessoes rodam em threads: serializa escritas e compactacao dos arquivos locais
+LOCAL_LOCK = threading.RLock()
+
+# Linhas por requisicao nas escritas/consultas em lote do Supabase
+SUPABASE_BATCH_SIZE = 500
+
+# Banco SQLite padrao (pode ser alterado com SQLITE_PATH nos secrets)
+SQLITE_FILE = Path(__file__).parent / "financeiro.db"
+# Conexao SQLite unica compartilhada entre sessoes: acesso serializado
+SQLITE_LOCK = threading.RLock()
+
+
+def chunked(items: list, size: int):
+    """Divide a lista em blocos de no maximo size itens"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_secret(name: str, default=None):
+    """Le um valor dos secrets (default se nao houver secrets.toml)"""
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+
+# Pool HTTP compartilhado pelos clientes Supabase (ajustavel nos secrets)
+SUPABASE_POOL_SIZE = 20
+SUPABASE_TIMEOUT = 10.0
+SUPABASE_CONNECT_TIMEOUT = 5.0
 
+# Clientes autenticados mantidos (um por sessao logada; os menos usados saem e pedem novo login)
+SUPABASE_MAX_SESSIONS = 1000
 
-def get_supabase_client() -> "Client | None":
-    """Retorna cliente Supabase se configurado, senao None"""
+SUPABASE_CLIENT_ERROR = "Nao foi possivel conectar ao Supabase. Tente novamente."
+
+
+def get_supabase_client(http_client=None) -> "Client | None":
+    """
+    Retorna cliente Supabase se configurado, senao None.
+    http_client (httpx.Client) e compartilhado entre clientes para reaproveitar conexoes.
+    """
     if not SUPABASE_AVAILABLE:
         return None
     
@@ -28,13 +92,128 @@ def get_supabase_client() -> "Client | None":
         key = st.secrets.get("SUPABASE_KEY")
         
         if url and key:
-            return create_client(url, key)
+            from supabase import ClientOptions, create_client
+            # Cada cliente guarda a propria sessao (storage em memoria por instancia)
+            return create_client(url, key, options=ClientOptions(httpx_client=http_client))
     except Exception:
         pass
     
     return None
 
 
+class SupabasePool:
+    """
+    Clientes Supabase por sessao sobre um unico pool HTTP (keep-alive, HTTP/2).
+    O login (ou logout) de uma sessao nao altera o cliente das outras, nem as
+    do mesmo usuario em outra aba, e todos reaproveitam as conexoes abertas em
+    vez de repetir o handshake TLS a cada requisicao. Nao ha volta silenciosa
+    para o cliente base: sessao sem cliente precisa de novo login.
+    """
+    
+    def __init__(self, http_client, base_client: "Client", http2: bool = False):
+        self.http = http_client
+        self.http2 = http2
+        self.base = base_client  # sem usuario: cadastro/login e OAuth
+        self.clients = OrderedDict()  # session_id -> (user_id, Client autenticado)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+    
+    def new_client(self) -> "Client | None":
+        """
+        Cria cliente ainda sem sessao, usando o pool HTTP compartilhado.
+        Retorna None se falhar: autenticar o cliente base o daria a todas as sessoes.
+        """
+        return get_supabase_client(self.http)
+    
+    def register(self, session_id: str, user_id: str, client: "Client"):
+        """Guarda o cliente autenticado da sessao"""
+        with self.lock:
+            self.clients[session_id] = (user_id, client)
+            self.clients.move_to_end(session_id)
+            while len(self.clients) > SUPABASE_MAX_SESSIONS:
+                self.clients.popitem(last=False)
+    
+    def remove(self, session_id: str) -> "Client | None":
+        with self.lock:
+            entry = self.clients.pop(session_id, None)
+        return entry[1] if entry else None
+    
+    def user_client(self, user_id: str) -> "Client | None":
+        """Cliente de alguma sessao do usuario (a usada mais recentemente), ou None"""
+        with self.lock:
+            for owner, client in reversed(self.clients.values()):
+                if owner == user_id:
+                    return client
+        return None
+    
+    def client_for(self, session_id: str, user_id: str) -> "Client | None":
+        """Retorna o cliente da sessao, ou None se ela nao tem cliente do usuario"""
+        with self.lock:
+            entry = self.clients.get(session_id)
+            if entry is None or entry[0] != user_id:
+                return None
+            self.clients.move_to_end(session_id)
+            return entry[1]
+    
+    def on_request(self, request):
+        """Hook do httpx: conta requisicoes e acompanha conexoes novas via trace do httpcore"""
+        with self.lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+    
+    def trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            with self.lock:
+                self.connections += 1
+        elif event_name == "connection.start_tls.complete":
+            with self.lock:
+                self.tls_handshakes += 1
+    
+    def stats(self) -> dict:
+        """Retorna requisicoes, conexoes abertas, handshakes TLS e taxa de reaproveitamento"""
+        with self.lock:
+            reused = max(self.requests - self.connections, 0)
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+                "sessions": len(self.clients),
+                "http2": self.http2
+            }
+
+
+def get_supabase_pool() -> SupabasePool | None:
+    """Monta o pool de clientes se o Supabase estiver configurado, senao None"""
+    if not (get_secret("SUPABASE_URL") and get_secret("SUPABASE_KEY")):
+        return None
+    try:
+        import httpx
+    except ImportError:
+        return None
+    
+    size = int(get_secret("SUPABASE_POOL_SIZE", SUPABASE_POOL_SIZE))
+    # HTTP/2 multiplexa requisicoes simultaneas numa conexao; requer o pacote h2
+    http2 = importlib.util.find_spec("h2") is not None
+    http_client = httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+        timeout=httpx.Timeout(
+            float(get_secret("SUPABASE_TIMEOUT", SUPABASE_TIMEOUT)),
+            connect=float(get_secret("SUPABASE_CONNECT_TIMEOUT", SUPABASE_CONNECT_TIMEOUT))
+        )
+    )
+    base_client = get_supabase_client(http_client)
+    if base_client is None:
+        http_client.close()
+        return None
+    pool = SupabasePool(http_client, base_client, http2)
+    http_client.event_hooks["request"].append(pool.on_request)
+    return pool
+
+
 # =============================================================================
 # Autenticacao
 # =============================================================================
@@ -100,9 +279,9 @@ def sign_in_with_google(client: "Client") -> dict:
 
 
 def sign_out(client: "Client"):
-    """Faz logout do usuario"""
+    """Faz logout da sessao (escopo local: as outras sessoes do usuario continuam validas)"""
     try:
-        client.auth.sign_out()
+        client.auth.sign_out({"scope": "local"})
     except Exception:
         pass
 
@@ -120,50 +299,444 @@ def get_user_id() -> str | None:
     return None
 
 
+SESSION_ID_KEY = "_session_id"
+
+
+def get_session_id() -> str:
+    """Identificador da sessao do navegador (cada aba logada tem seu cliente Supabase)"""
+    session_id = st.session_state.get(SESSION_ID_KEY)
+    if session_id is None:
+        session_id = st.session_state[SESSION_ID_KEY] = uuid.uuid4().hex
+    return session_id
+
+
 # =============================================================================
 # Funcoes Locais (JSON)
 # =============================================================================
 
+def empty_local_data() -> dict:
+    """Retorna estrutura vazia dos dados locais"""
+    return {"transactions": [], "goal": {"amount": 0}, "reminders": [], "recurring": []}
+
+
 def init_local_data():
     """Inicializa dados locais se arquivo nao existe"""
     if not DATA_FILE.exists():
-        save_local_data({
-            "transactions": [],
-            "goal": {"amount": 0},
-            "reminders": []
-        })
+        write_snapshot_file(empty_local_data())
 
 
-def load_local_data() -> dict:
-    """Carrega dados do arquivo JSON local"""
+def page_by_keyset(records: list, cursor: tuple | None, limit: int) -> tuple:
+    """
+    Retorna (pagina, proximo cursor) em ordem (date, id) decrescente.
+    cursor e o (date, id) do ultimo item da pagina anterior.
+    """
+    if cursor is not None:
+        cursor = tuple(cursor)
+        records = [r for r in records if (r["date"], r["id"]) < cursor]
+    rows = heapq.nlargest(limit + 1, records, key=lambda r: (r["date"], r["id"]))
+    return page_result(rows, limit)
+
+
+def page_result(rows: list, limit: int) -> tuple:
+    """Separa a pagina do item extra buscado para saber se ha proxima pagina"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1]["date"], rows[-1]["id"])
+    return rows, None
+
+
+def filter_transactions(transactions: list, category: str | None = None, tipo: str | None = None) -> list:
+    """Filtra transacoes por categoria e tipo (None = todos)"""
+    return [
+        t for t in transactions
+        if (category is None or t["category"] == category) and (tipo is None or t["type"] == tipo)
+    ]
+
+
+def read_snapshot_file() -> dict:
+    """Le o data.json (estado compactado, sem o log)"""
     init_local_data()
     try:
         with open(DATA_FILE, "r", encoding="utf-8") as f:
             return json.load(f)
     except Exception:
-        return {"transactions": [], "goal": {"amount": 0}, "reminders": []}
+        return empty_local_data()
+
+
+def read_journal() -> list:
+    """
+    Le operacoes do log. Uma linha final incompleta (escrita interrompida) e
+    cortada do arquivo: sem isso a proxima operacao seria gravada colada nela
+    e se perderia na proxima leitura.
+    """
+    if not JOURNAL_FILE.exists():
+        return []
+    ops = []
+    valid_end = 0  # byte logo apos a ultima operacao completa
+    with open(JOURNAL_FILE, "r+b") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                break
+            valid_end += len(line)
+        if f.seek(0, os.SEEK_END) > valid_end:
+            f.truncate(valid_end)
+            f.flush()
+            os.fsync(f.fileno())
+    return ops
+
+
+def file_stamp(path: Path) -> tuple | None:
+    """Retorna (mtime, tamanho) do arquivo, ou None se nao existe"""
+    try:
+        info = path.stat()
+    except FileNotFoundError:
+        return None
+    return (info.st_mtime_ns, info.st_size)
+
+
+def index_local_data(data: dict) -> dict:
+    """Converte listas de transacoes/lembretes/regras em dicts indexados por id"""
+    return {
+        "transactions": {r["id"]: r for r in data.get("transactions", [])},
+        "reminders": {r["id"]: r for r in data.get("reminders", [])},
+        "recurring": {r["id"]: r for r in data.get("recurring", [])},
+        "goal": data.get("goal", {"amount": 0})
+    }
+
+
+def apply_journal_op(state: dict, op: dict):
+    """Aplica uma operacao upsert/delete/set do log sobre o estado indexado (O(1))"""
+    if op["op"] == "set":
+        state[op["collection"]] = op["record"]
+    elif op["op"] == "upsert":
+        state[op["collection"]][op["record"]["id"]] = op["record"]
+    elif op["op"] == "delete":
+        state[op["collection"]].pop(op["id"], None)
+
+
+# Cache do processo com o estado local ja lido e indexado por id.
+# Validado pelo (mtime, tamanho) do data.json e do log: so rele se mudaram.
+# "columns" guarda as transacoes em colunas para os totais; atualizado a cada operacao do log.
+# "search" e o indice de busca das descricoes; atualizado a cada operacao do log.
+LOCAL_CACHE = {"data_stamp": None, "journal_stamp": None, "state": None, "columns": None, "search": None}
+
+
+def get_local_state() -> dict:
+    """Retorna estado local indexado por id, relendo os arquivos apenas se mudaram"""
+    with LOCAL_LOCK:
+        init_local_data()
+        data_stamp = file_stamp(DATA_FILE)
+        if (LOCAL_CACHE["state"] is None
+                or LOCAL_CACHE["data_stamp"] != data_stamp
+                or LOCAL_CACHE["journal_stamp"] != file_stamp(JOURNAL_FILE)):
+            state = index_local_data(read_snapshot_file())
+            for op in read_journal():
+                apply_journal_op(state, op)
+            # Carimbo do log depois de ler: read_journal pode ter cortado a linha incompleta
+            LOCAL_CACHE.update(data_stamp=data_stamp, journal_stamp=file_stamp(JOURNAL_FILE), state=state,
+                               columns=None, search=None)
+        return LOCAL_CACHE["state"]
+
+
+def get_local_columns() -> TransactionColumns:
+    """
+    Retorna as transacoes locais em colunas, montadas uma vez e atualizadas a
+    cada escrita. As escritas alteram os arrays no lugar: ler com LOCAL_LOCK.
+    """
+    with LOCAL_LOCK:
+        state = get_local_state()
+        if LOCAL_CACHE["columns"] is None:
+            LOCAL_CACHE["columns"] = TransactionColumns.from_transactions(state["transactions"].values(), index_ids=True)
+        return LOCAL_CACHE["columns"]
+
+
+def get_local_search_index() -> SearchIndex:
+    """Retorna o indice de busca das transacoes locais (montado no primeiro uso)"""
+    with LOCAL_LOCK:
+        state = get_local_state()
+        if LOCAL_CACHE["search"] is None:
+            LOCAL_CACHE["search"] = SearchIndex.from_records(state["transactions"].values(), ("description",))
+        return LOCAL_CACHE["search"]
+
+
+def update_search_index(index: SearchIndex | None, op: dict):
+    """Aplica uma operacao upsert/delete de transacao ao indice de busca (se montado)"""
+    if index is None or op["collection"] != "transactions":
+        return
+    if op["op"] == "upsert":
+        index.add(op["record"]["id"], op["record"].get("description"))
+    elif op["op"] == "delete":
+        index.remove(op["id"])
+
+
+def update_columns(columns: TransactionColumns | None, op: dict):
+    """Aplica uma operacao upsert/delete de transacao as colunas (se montadas)"""
+    if columns is None or op["collection"] != "transactions":
+        return
+    if op["op"] == "upsert":
+        columns.upsert(op["record"])
+    elif op["op"] == "delete":
+        columns.remove(op["id"])
+
+
+def append_journal(op: dict):
+    """Acrescenta uma operacao ao log e aplica no cache (sem reescrever o data.json)"""
+    append_journal_ops([op])
+
+
+def append_journal_ops(ops: list):
+    """Acrescenta varias operacoes ao log com uma unica escrita e um unico fsync"""
+    if not ops:
+        return
+    with LOCAL_LOCK:
+        state = get_local_state()
+        with open(JOURNAL_FILE, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+            f.flush()
+            os.fsync(f.fileno())
+        for op in ops:
+            apply_journal_op(state, op)
+            update_search_index(LOCAL_CACHE["search"], op)
+            update_columns(LOCAL_CACHE["columns"], op)
+        LOCAL_CACHE["journal_stamp"] = file_stamp(JOURNAL_FILE)
+        # Compacta quando o log passa do limite e do proprio data.json:
+        # o custo de reescrever o arquivo fica amortizado entre as escritas
+        if LOCAL_CACHE["journal_stamp"][1] > max(JOURNAL_MAX_BYTES, LOCAL_CACHE["data_stamp"][1]):
+            compact_local_data()
+
+
+def compact_local_data():
+    """Grava o estado atual (data.json + log) no data.json e limpa o log"""
+    with LOCAL_LOCK:
+        if JOURNAL_FILE.exists():
+            columns, search = LOCAL_CACHE["columns"], LOCAL_CACHE["search"]
+            save_local_data(load_local_data())
+            # Mesmos dados em outro arquivo: colunas e indice de busca continuam valendo
+            LOCAL_CACHE.update(columns=columns, search=search)
+
+
+def load_local_data() -> dict:
+    """Carrega dados locais (data.json mais as operacoes do log) a partir do cache"""
+    state = get_local_state()
+    with LOCAL_LOCK:
+        return {
+            "transactions": list(state["transactions"].values()),
+            "goal": state["goal"],
+            "reminders": list(state["reminders"].values()),
+            "recurring": list(state["recurring"].values())
+        }
+
+
+def load_local_records(collection: str) -> list:
+    """Registros de uma colecao local (lembretes, regras) sem montar as demais"""
+    with LOCAL_LOCK:
+        return list(get_local_state()[collection].values())
+
+
+def load_local_goal() -> dict:
+    """Meta local, lida direto do estado indexado"""
+    with LOCAL_LOCK:
+        return get_local_state()["goal"]
+
+
+def iter_local_transactions(start: str | None = None, end: str | None = None,
+                            category: str | None = None, tipo: str | None = None):
+    """
+    Percorre as transacoes locais do intervalo e filtros sem copiar as demais.
+    Consumir com o LOCAL_LOCK em maos (o estado muda a cada escrita).
+    """
+    for t in get_local_state()["transactions"].values():
+        if ((start is None or t["date"] >= start) and (end is None or t["date"] < end)
+                and (category is None or t["category"] == category) and (tipo is None or t["type"] == tipo)):
+            yield t
+
+
+def write_snapshot_file(data: dict):
+    """Grava o data.json de forma atomica (arquivo temporario + rename)"""
+    tmp_file = DATA_FILE.with_suffix(".json.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        # json.dumps sem indentacao usa o encoder em C (bem mais rapido que json.dump)
+        f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, DATA_FILE)
 
 
 def save_local_data(data: dict):
-    """Salva dados no arquivo JSON local"""
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """
+    Substitui todos os dados locais (data.json) e limpa o log.
+    O data.json continua sendo o formato de importacao/exportacao.
+    """
+    with LOCAL_LOCK:
+        write_snapshot_file(data)
+        JOURNAL_FILE.unlink(missing_ok=True)
+        LOCAL_CACHE.update(
+            data_stamp=file_stamp(DATA_FILE),
+            journal_stamp=None,
+            state=index_local_data(data),
+            columns=None,
+            search=None
+        )
+
+
+# =============================================================================
+# Snapshot da Sessao
+# =============================================================================
+# O indice mensal do painel fica na sessao entre reruns, marcado com a
+# versao dos dados do usuario (Database.data_version). Cada escrita gera uma
+# versao nova: a sessao que escreveu aplica a escrita ao indice e adota a
+# versao; as outras sessoes do usuario recarregam.
+
+SNAPSHOT_KEY = "_transactions_snapshot"
+
+
+def get_snapshot() -> dict:
+    """Retorna snapshot do indice mensal da sessao atual (recria se o usuario mudou)"""
+    user_id = get_user_id()
+    snapshot = st.session_state.get(SNAPSHOT_KEY)
+    if snapshot is None or snapshot["user_id"] != user_id:
+        snapshot = {
+            "user_id": user_id,
+            "index_range": None,
+            "index": None,
+            "version": None,
+            "loaded_at": None
+        }
+        st.session_state[SNAPSHOT_KEY] = snapshot
+    return snapshot
+
+
+def reset_snapshot():
+    """Descarta o snapshot (proximo acesso carrega do backend)"""
+    st.session_state.pop(SNAPSHOT_KEY, None)
+
+
+def invalidate_snapshot():
+    """Descarta o indice do snapshot"""
+    get_snapshot()["index"] = None
+
+
+REMINDER_SCHEDULE_KEY = "_reminder_schedule"
+
+
+def invalidate_reminder_schedule():
+    """Descarta a agenda de lembretes da sessao (apos escrever lembretes)"""
+    st.session_state.pop(REMINDER_SCHEDULE_KEY, None)
+
+
+def in_range(date_range: tuple, transaction: dict) -> bool:
+    """Verifica se a data da transacao esta no intervalo (inicio, fim exclusivo)"""
+    start, end = date_range
+    return (start is None or transaction["date"] >= start) and (end is None or transaction["date"] < end)
+
+
+def update_snapshot(old: dict | None, transaction: dict | None):
+    """
+    Aplica uma escrita ao indice do snapshot sem refazer a busca: desconta a
+    versao anterior (old; None = transacao nova) e soma a nova (None = excluida).
+    """
+    snapshot = get_snapshot()
+    index = snapshot["index"]
+    if index is None:
+        return
+    if old is not None and in_range(snapshot["index_range"], old):
+        index.remove(old)
+    if transaction is not None and in_range(snapshot["index_range"], transaction):
+        index.add(transaction)
 
 
 # =============================================================================
 # Funcoes Supabase (com user_id)
 # =============================================================================
 
-def load_transactions_supabase(client: "Client", user_id: str) -> list:
-    """Carrega transacoes do usuario"""
+# Colunas buscadas por tela (evita select("*") trazendo user_id em toda linha)
+TRANSACTION_COLUMNS = "id,type,amount,date,category,description"
+# Modo resumo: apenas o necessario para agregar totais
+TRANSACTION_SUMMARY_COLUMNS = "type,amount,date,category"
+GOAL_COLUMNS = "id,amount"
+REMINDER_COLUMNS = "id,name,amount,dueDate,notes,recurrence,paidUntil"
+# Sem a migracao 003 a tabela tem so as colunas base (ou, se antiga, so recurrence)
+REMINDER_BASE_COLUMNS = "id,name,amount,dueDate,notes"
+REMINDER_OPTIONAL_COLUMNS = ("recurrence", "paidUntil")
+# Codigos do PostgREST para coluna inexistente (do Postgres e do cache de schema)
+UNDEFINED_COLUMN_CODES = ("42703", "PGRST204")
+RECURRING_COLUMNS = "id,type,amount,category,description,start_date,frequency,end_date,materialized_until"
+CATEGORY_COLUMNS = "type,category,description"
+
+# Linhas por requisicao nas cargas paginadas e na sincronizacao incremental
+# (limite padrao max-rows do PostgREST: um select maior volta cortado)
+SYNC_PAGE_SIZE = 1000
+
+
+def load_transactions_supabase(client: "Client", user_id: str, start: str | None = None, end: str | None = None,
+                               columns: str = TRANSACTION_COLUMNS) -> list:
+    """
+    Carrega transacoes do usuario (opcionalmente apenas start <= date < end).
+    columns=TRANSACTION_SUMMARY_COLUMNS para quem so agrega valores.
+    Busca em paginas ordenadas por id (keyset): um select so traria no maximo
+    max-rows linhas. As linhas trazem id mesmo que columns nao o inclua.
+    """
+    if "id" not in columns.split(","):
+        columns += ",id"
     try:
-        response = client.table("transactions").select("*").eq("user_id", user_id).execute()
-        return response.data or []
+        rows = []
+        while True:
+            query = client.table("transactions").select(columns).eq("user_id", user_id)
+            if start:
+                query = query.gte("date", start)
+            if end:
+                query = query.lt("date", end)
+            if rows:
+                query = query.gt("id", rows[-1]["id"])
+            page = query.order("id").limit(SYNC_PAGE_SIZE).execute().data or []
+            rows.extend(page)
+            if len(page) < SYNC_PAGE_SIZE:
+                return rows
     except Exception as e:
         st.error(f"Erro ao carregar transacoes: {e}")
         return []
 
 
+def load_monthly_totals_supabase(client: "Client", start: str | None = None, end: str | None = None) -> list | None:
+    """
+    Carrega totais agregados por (mes, tipo, categoria) via RPC dashboard_totals.
+    Retorna None se a funcao nao estiver instalada (ver migrations/).
+    """
+    try:
+        response = client.rpc("dashboard_totals", {"start_date": start, "end_date": end}).execute()
+        return response.data or []
+    except Exception:
+        return None
+
+
+def load_transactions_page_supabase(client: "Client", user_id: str, start: str | None, end: str | None,
+                                    cursor: tuple | None, limit: int,
+                                    category: str | None = None, tipo: str | None = None) -> tuple:
+    """Carrega uma pagina de transacoes ordenada por (date, id) decrescente (paginacao por keyset)"""
+    try:
+        query = client.table("transactions").select(TRANSACTION_COLUMNS).eq("user_id", user_id)
+        if start:
+            query = query.gte("date", start)
+        if end:
+            query = query.lt("date", end)
+        if category:
+            query = query.eq("category", category)
+        if tipo:
+            query = query.eq("type", tipo)
+        if cursor:
+            last_date, last_id = cursor
+            query = query.or_(f"date.lt.{last_date},and(date.eq.{last_date},id.lt.{last_id})")
+        response = query.order("date", desc=True).order("id", desc=True).limit(limit + 1).execute()
+        return page_result(response.data or [], limit)
+    except Exception as e:
+        st.error(f"Erro ao carregar transacoes: {e}")
+        return [], None
+
+
 def save_transaction_supabase(client: "Client", transaction: dict, user_id: str):
     """Salva transacao do usuario"""
     try:
@@ -173,6 +746,63 @@ def save_transaction_supabase(client: "Client", transaction: dict, user_id: str)
         st.error(f"Erro ao salvar transacao: {e}")
 
 
+def save_transactions_supabase(client: "Client", transactions: list, user_id: str):
+    """Salva varias transacoes do usuario com um upsert de varias linhas por lote"""
+    try:
+        for chunk in chunked(transactions, SUPABASE_BATCH_SIZE):
+            for transaction in chunk:
+                transaction["user_id"] = user_id
+            client.table("transactions").upsert(chunk).execute()
+    except Exception as e:
+        st.error(f"Erro ao salvar transacoes: {e}")
+
+
+def delete_transactions_supabase(client: "Client", transaction_ids: list, user_id: str):
+    """Remove varias transacoes do usuario com um delete por lote"""
+    try:
+        for chunk in chunked(transaction_ids, SUPABASE_BATCH_SIZE):
+            client.table("transactions").delete().in_("id", chunk).eq("user_id", user_id).execute()
+    except Exception as e:
+        st.error(f"Erro ao excluir transacoes: {e}")
+
+
+def search_transactions_supabase(client: "Client", query: str, limit: int) -> list | None:
+    """
+    Busca transacoes pela descricao via RPC search_transactions (pg_trgm).
+    Retorna None se a funcao nao estiver instalada (ver migrations/).
+    """
+    try:
+        response = client.rpc("search_transactions", {"query": query, "max_results": limit}).execute()
+        return response.data or []
+    except Exception:
+        return None
+
+
+def search_transactions_ilike_supabase(client: "Client", user_id: str, query: str, limit: int) -> list:
+    """Busca sem a migracao 005: descricao contendo o texto (ILIKE), mais recentes primeiro"""
+    try:
+        pattern = "%" + query.replace("%", "").replace("_", "").strip() + "%"
+        response = (client.table("transactions").select(TRANSACTION_COLUMNS).eq("user_id", user_id)
+                    .ilike("description", pattern).order("date", desc=True).order("id", desc=True)
+                    .limit(limit).execute())
+        return response.data or []
+    except Exception as e:
+        st.error(f"Erro ao buscar transacoes: {e}")
+        return []
+
+
+def find_transaction_ids_supabase(client: "Client", ids: list, user_id: str) -> set:
+    """Retorna quais dos ids ja existem entre as transacoes do usuario"""
+    found = set()
+    try:
+        for chunk in chunked(ids, SUPABASE_BATCH_SIZE):
+            response = client.table("transactions").select("id").eq("user_id", user_id).in_("id", chunk).execute()
+            found.update(row["id"] for row in response.data or [])
+    except Exception as e:
+        st.error(f"Erro ao verificar transacoes: {e}")
+    return found
+
+
 def delete_transaction_supabase(client: "Client", transaction_id: str, user_id: str):
     """Remove transacao do usuario"""
     try:
@@ -184,7 +814,7 @@ def delete_transaction_supabase(client: "Client", transaction_id: str, user_id:
 def load_goal_supabase(client: "Client", user_id: str) -> dict:
     """Carrega meta do usuario"""
     try:
-        response = client.table("goals").select("*").eq("user_id", user_id).limit(1).execute()
+        response = client.table("goals").select(GOAL_COLUMNS).eq("user_id", user_id).limit(1).execute()
         if response.data:
             return response.data[0]
         return {"id": user_id, "user_id": user_id, "amount": 0}
@@ -203,16 +833,58 @@ def save_goal_supabase(client: "Client", goal: dict, user_id: str):
         st.error(f"Erro ao salvar meta: {e}")
 
 
-def load_reminders_supabase(client: "Client", user_id: str) -> list:
+def load_reminders_supabase(client: "Client", user_id: str, columns: str = REMINDER_COLUMNS) -> list:
     """Carrega lembretes do usuario"""
     try:
-        response = client.table("reminders").select("*").eq("user_id", user_id).execute()
+        response = client.table("reminders").select(columns).eq("user_id", user_id).execute()
         return response.data or []
     except Exception as e:
         st.error(f"Erro ao carregar lembretes: {e}")
         return []
 
 
+def load_reminder_columns_supabase(client: "Client") -> str | None:
+    """
+    Descobre quais colunas opcionais (migracao 003) a tabela reminders tem.
+    Retorna as colunas para o select, ou None se a consulta falhar por outro
+    motivo (rede, timeout): so o erro de coluna inexistente conta como ausente.
+    """
+    columns = [REMINDER_BASE_COLUMNS]
+    for column in REMINDER_OPTIONAL_COLUMNS:
+        try:
+            client.table("reminders").select(column).limit(1).execute()
+            columns.append(column)
+        except Exception as e:
+            if getattr(e, "code", None) not in UNDEFINED_COLUMN_CODES:
+                return None
+    return ",".join(columns)
+
+
+def load_changes_page_supabase(client: "Client", table: str, columns: str, user_id: str,
+                               time_column: str, id_column: str,
+                               since: str | None, cursor: tuple | None) -> list | None:
+    """
+    Carrega uma pagina de linhas alteradas com time_column >= since, ordenada
+    por (time_column, id_column) e continuando apos cursor (keyset).
+    Retorna None se a consulta falhar (ex: migracao 002 nao instalada).
+    """
+    try:
+        query = client.table(table).select(columns).eq("user_id", user_id)
+        if cursor is not None:
+            last_time, last_id = cursor
+            query = query.or_(
+                f'{time_column}.gt."{last_time}",'
+                f'and({time_column}.eq."{last_time}",{id_column}.gt."{last_id}")'
+            )
+        elif since:
+            query = query.gte(time_column, since)
+        response = query.order(time_column).order(id_column).limit(SYNC_PAGE_SIZE).execute()
+        return response.data or []
+    except Exception as e:
+        st.error(f"Erro ao sincronizar {table}: {e}")
+        return None
+
+
 def save_reminder_supabase(client: "Client", reminder: dict, user_id: str):
     """Salva lembrete do usuario"""
     try:
@@ -222,6 +894,17 @@ def save_reminder_supabase(client: "Client", reminder: dict, user_id: str):
         st.error(f"Erro ao salvar lembrete: {e}")
 
 
+def save_reminders_supabase(client: "Client", reminders: list, user_id: str):
+    """Salva varios lembretes do usuario com um upsert de varias linhas por lote"""
+    try:
+        for chunk in chunked(reminders, SUPABASE_BATCH_SIZE):
+            for reminder in chunk:
+                reminder["user_id"] = user_id
+            client.table("reminders").upsert(chunk).execute()
+    except Exception as e:
+        st.error(f"Erro ao salvar lembretes: {e}")
+
+
 def delete_reminder_supabase(client: "Client", reminder_id: str, user_id: str):
     """Remove lembrete do usuario"""
     try:
@@ -230,133 +913,1832 @@ def delete_reminder_supabase(client: "Client", reminder_id: str, user_id: str):
         st.error(f"Erro ao excluir lembrete: {e}")
 
 
+def delete_reminders_supabase(client: "Client", reminder_ids: list, user_id: str):
+    """Remove varios lembretes do usuario com um delete por lote"""
+    try:
+        for chunk in chunked(reminder_ids, SUPABASE_BATCH_SIZE):
+            client.table("reminders").delete().in_("id", chunk).eq("user_id", user_id).execute()
+    except Exception as e:
+        st.error(f"Erro ao excluir lembretes: {e}")
+
+
+def load_recurring_rules_supabase(client: "Client", user_id: str) -> list | None:
+    """
+    Carrega regras de lancamentos recorrentes do usuario.
+    Retorna None se a tabela nao existir (migracao 004 nao instalada).
+    """
+    try:
+        response = client.table("recurring_rules").select(RECURRING_COLUMNS).eq("user_id", user_id).execute()
+        return response.data or []
+    except Exception:
+        return None
+
+
+def save_recurring_rules_supabase(client: "Client", rules: list, user_id: str):
+    """Salva regras recorrentes do usuario com um upsert de varias linhas por lote"""
+    try:
+        for chunk in chunked(rules, SUPABASE_BATCH_SIZE):
+            for rule in chunk:
+                rule["user_id"] = user_id
+            client.table("recurring_rules").upsert(chunk).execute()
+    except Exception as e:
+        st.error(f"Erro ao salvar lancamentos recorrentes: {e}")
+
+
+def delete_recurring_rule_supabase(client: "Client", rule_id: str, user_id: str):
+    """Remove regra recorrente do usuario (as transacoes ja geradas ficam)"""
+    try:
+        client.table("recurring_rules").delete().eq("id", rule_id).eq("user_id", user_id).execute()
+    except Exception as e:
+        st.error(f"Erro ao excluir lancamento recorrente: {e}")
+
+
 # =============================================================================
-# Interface Unificada
+# Funcoes SQLite (com user_id)
 # =============================================================================
 
-class Database:
-    """Classe unificada para acesso ao banco de dados"""
-    
-    def __init__(self):
-        self.client = get_supabase_client()
-        self.is_cloud = self.client is not None
-        
-        if not self.is_cloud:
-            init_local_data()
-    
-    def get_mode(self) -> str:
-        """Retorna modo atual: 'cloud' ou 'local'"""
-        return "cloud" if self.is_cloud else "local"
-    
-    def get_client(self):
-        """Retorna cliente Supabase"""
-        return self.client
-    
-    # Autenticacao
-    def sign_up(self, email: str, password: str) -> dict:
-        if not self.is_cloud:
-            return {"success": False, "error": "Modo local nao suporta autenticacao"}
-        return sign_up(self.client, email, password)
-    
-    def sign_in(self, email: str, password: str) -> dict:
-        if not self.is_cloud:
-            return {"success": False, "error": "Modo local nao suporta autenticacao"}
-        return sign_in(self.client, email, password)
-    
-    def sign_in_with_google(self) -> dict:
-        if not self.is_cloud:
-            return {"success": False, "error": "Modo local nao suporta autenticacao"}
-        return sign_in_with_google(self.client)
-    
-    def sign_out(self):
-        if self.is_cloud:
-            sign_out(self.client)
-        st.session_state.pop("user", None)
-    
-    # Transacoes
-    def load_transactions(self) -> list:
-        if self.is_cloud:
-            user_id = get_user_id()
-            if user_id:
-                return load_transactions_supabase(self.client, user_id)
-            return []
-        return load_local_data().get("transactions", [])
-    
-    def save_transaction(self, transaction: dict):
-        if self.is_cloud:
-            user_id = get_user_id()
-            if user_id:
-                save_transaction_supabase(self.client, transaction, user_id)
-        else:
-            data = load_local_data()
-            existing = next((i for i, t in enumerate(data["transactions"]) if t["id"] == transaction["id"]), None)
-            if existing is not None:
-                data["transactions"][existing] = transaction
-            else:
-                data["transactions"].append(transaction)
-            save_local_data(data)
-    
-    def delete_transaction(self, transaction_id: str):
-        if self.is_cloud:
-            user_id = get_user_id()
-            if user_id:
-                delete_transaction_supabase(self.client, transaction_id, user_id)
-        else:
-            data = load_local_data()
-            data["transactions"] = [t for t in data["transactions"] if t["id"] != transaction_id]
-            save_local_data(data)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    salt TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    date TEXT NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS goals (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    amount REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    amount REAL,
+    "dueDate" TEXT NOT NULL,
+    notes TEXT,
+    recurrence TEXT,
+    "paidUntil" TEXT
+);
+
+CREATE TABLE IF NOT EXISTS recurring_rules (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT,
+    start_date TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    end_date TEXT,
+    materialized_until TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user_id, date);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_category ON transactions(user_id, category);
+CREATE INDEX IF NOT EXISTS idx_goals_user ON goals(user_id);
+CREATE INDEX IF NOT EXISTS idx_reminders_user_due ON reminders(user_id, "dueDate");
+CREATE INDEX IF NOT EXISTS idx_recurring_rules_user ON recurring_rules(user_id);
+"""
+
+TRANSACTION_COLUMNS_SQLITE = "id, type, amount, date, category, description"
+REMINDER_COLUMNS_SQLITE = 'id, name, amount, "dueDate", notes, recurrence, "paidUntil"'
+RECURRING_COLUMNS_SQLITE = RECURRING_COLUMNS.replace(",", ", ")
+
+# Limites usados quando o intervalo de datas e aberto (mantem o indice em uso)
+MIN_DATE = "0000-00-00"
+MAX_DATE = "9999-99-99"
+
+# Limite de parametros por consulta IN (...) no SQLite
+SQLITE_MAX_PARAMS = 500
+
+# Iteracoes do PBKDF2 para senhas do modo SQLite
+PASSWORD_ITERATIONS = 200_000
+
+
+def get_sqlite_connection(path: str | None = None) -> sqlite3.Connection:
+    """
+    Abre o banco SQLite configurado (ou o arquivo em path) e cria o schema.
+    WAL permite leituras enquanto ha escrita; as consultas usam sempre o
+    mesmo texto SQL com parametros, reaproveitando o cache de statements
+    preparados do sqlite3.
+    """
+    path = Path(path or get_secret("SQLITE_PATH", SQLITE_FILE))
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SQLITE_SCHEMA)
+    # Bancos criados antes dos lembretes recorrentes
+    for column in ("recurrence", '"paidUntil"'):
+        try:
+            conn.execute(f"ALTER TABLE reminders ADD COLUMN {column} TEXT")
+        except sqlite3.OperationalError:
+            pass
+    return conn
+
+
+def hash_password(password: str, salt: str) -> str:
+    """Gera hash PBKDF2 da senha"""
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt), PASSWORD_ITERATIONS).hex()
+
+
+def sign_up_sqlite(conn: sqlite3.Connection, email: str, password: str) -> dict:
+    """Registra novo usuario no banco SQLite"""
+    email = email.strip().lower()
+    if "@" not in email:
+        return {"success": False, "error": "Email invalido"}
+    if len(password) < 6:
+        return {"success": False, "error": "A senha deve ter pelo menos 6 caracteres"}
     
-    # Meta
-    def load_goal(self) -> dict:
-        if self.is_cloud:
-            user_id = get_user_id()
-            if user_id:
-                return load_goal_supabase(self.client, user_id)
-            return {"amount": 0}
-        return load_local_data().get("goal", {"amount": 0})
+    salt = secrets.token_hex(16)
+    user = SimpleNamespace(id=str(uuid.uuid4()), email=email)
+    try:
+        with SQLITE_LOCK, conn:
+            conn.execute(
+                "INSERT INTO users (id, email, password_hash, salt) VALUES (?, ?, ?, ?)",
+                (user.id, email, hash_password(password, salt), salt)
+            )
+        return {"success": True, "user": user}
+    except sqlite3.IntegrityError:
+        return {"success": False, "error": "Este email ja esta cadastrado"}
+    except Exception as e:
+        return {"success": False, "error": f"Erro: {e}"}
+
+
+def sign_in_sqlite(conn: sqlite3.Connection, email: str, password: str) -> dict:
+    """Faz login do usuario no banco SQLite"""
+    try:
+        with SQLITE_LOCK:
+            row = conn.execute(
+                "SELECT id, email, password_hash, salt FROM users WHERE email = ?",
+                (email.strip().lower(),)
+            ).fetchone()
+    except Exception as e:
+        return {"success": False, "error": f"Erro: {e}"}
     
-    def save_goal(self, goal: dict):
-        if self.is_cloud:
-            user_id = get_user_id()
+    if row is None or not secrets.compare_digest(row["password_hash"], hash_password(password, row["salt"])):
+        return {"success": False, "error": "Email ou senha incorretos"}
+    return {"success": True, "user": SimpleNamespace(id=row["id"], email=row["email"]), "session": None}
+
+
+def load_transactions_sqlite(conn: sqlite3.Connection, user_id: str, start: str | None = None, end: str | None = None) -> list:
+    """Carrega transacoes do usuario (opcionalmente apenas start <= date < end)"""
+    try:
+        with SQLITE_LOCK:
+            rows = conn.execute(
+                f"SELECT {TRANSACTION_COLUMNS_SQLITE} FROM transactions "
+                "WHERE user_id = ? AND date >= ? AND date < ?",
+                (user_id, start or MIN_DATE, end or MAX_DATE)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        st.error(f"Erro ao carregar transacoes: {e}")
+        return []
+
+
+def load_transaction_sqlite(conn: sqlite3.Connection, transaction_id: str, user_id: str) -> dict | None:
+    """Carrega uma transacao do usuario pelo id (None se nao existe)"""
+    try:
+        with SQLITE_LOCK:
+            row = conn.execute(
+                f"SELECT {TRANSACTION_COLUMNS_SQLITE} FROM transactions WHERE id = ? AND user_id = ?",
+                (transaction_id, user_id)
+            ).fetchone()
+        return dict(row) if row else None
+    except Exception as e:
+        st.error(f"Erro ao carregar transacao: {e}")
+        return None
+
+
+def load_monthly_totals_sqlite(conn: sqlite3.Connection, user_id: str, start: str | None = None, end: str | None = None) -> list:
+    """Carrega totais agregados por (mes, tipo, categoria), como a RPC dashboard_totals"""
+    try:
+        with SQLITE_LOCK:
+            rows = conn.execute(
+                "SELECT substr(date, 1, 7) AS month, type, category, SUM(amount) AS total, COUNT(*) AS count "
+                "FROM transactions "
+                "WHERE user_id = ? AND date >= ? AND date < ? "
+                "GROUP BY month, type, category",
+                (user_id, start or MIN_DATE, end or MAX_DATE)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        st.error(f"Erro ao carregar totais: {e}")
+        return []
+
+
+def load_transactions_page_sqlite(conn: sqlite3.Connection, user_id: str, start: str | None, end: str | None,
+                                  cursor: tuple | None, limit: int,
+                                  category: str | None = None, tipo: str | None = None) -> tuple:
+    """Carrega uma pagina de transacoes ordenada por (date, id) decrescente (paginacao por keyset)"""
+    last_date, last_id = cursor if cursor else (MAX_DATE, "")
+    try:
+        with SQLITE_LOCK:
+            rows = conn.execute(
+                f"SELECT {TRANSACTION_COLUMNS_SQLITE} FROM transactions "
+                "WHERE user_id = ? AND date >= ? AND date < ? "
+                "AND (? IS NULL OR category = ?) AND (? IS NULL OR type = ?) "
+                "AND (date < ? OR (date = ? AND id < ?)) "
+                "ORDER BY date DESC, id DESC LIMIT ?",
+                (user_id, start or MIN_DATE, end or MAX_DATE, category, category, tipo, tipo,
+                 last_date, last_date, last_id, limit + 1)
+            ).fetchall()
+        return page_result([dict(row) for row in rows], limit)
+    except Exception as e:
+        st.error(f"Erro ao carregar transacoes: {e}")
+        return [], None
+
+
+UPSERT_TRANSACTION_SQLITE = (
+    "INSERT INTO transactions (id, user_id, type, amount, date, category, description) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(id) DO UPDATE SET type = excluded.type, amount = excluded.amount, "
+    "date = excluded.date, category = excluded.category, description = excluded.description "
+    "WHERE transactions.user_id = excluded.user_id"
+)
+
+
+def transaction_params_sqlite(transaction: dict, user_id: str) -> tuple:
+    """Parametros do UPSERT_TRANSACTION_SQLITE para uma transacao"""
+    return (transaction["id"], user_id, transaction["type"], transaction["amount"],
+            transaction["date"], transaction["category"], transaction.get("description"))
+
+
+def save_transaction_sqlite(conn: sqlite3.Connection, transaction: dict, user_id: str):
+    """Salva transacao do usuario (nao sobrescreve registro de outro usuario)"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.execute(UPSERT_TRANSACTION_SQLITE, transaction_params_sqlite(transaction, user_id))
+    except Exception as e:
+        st.error(f"Erro ao salvar transacao: {e}")
+
+
+def save_transactions_sqlite(conn: sqlite3.Connection, transactions: list, user_id: str):
+    """Salva varias transacoes do usuario em uma unica transacao do banco"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.executemany(UPSERT_TRANSACTION_SQLITE, [transaction_params_sqlite(t, user_id) for t in transactions])
+    except Exception as e:
+        st.error(f"Erro ao salvar transacoes: {e}")
+
+
+def delete_transactions_sqlite(conn: sqlite3.Connection, transaction_ids: list, user_id: str):
+    """Remove varias transacoes do usuario em uma unica transacao do banco"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.executemany(
+                "DELETE FROM transactions WHERE id = ? AND user_id = ?",
+                [(transaction_id, user_id) for transaction_id in transaction_ids]
+            )
+    except Exception as e:
+        st.error(f"Erro ao excluir transacoes: {e}")
+
+
+def find_transaction_ids_sqlite(conn: sqlite3.Connection, ids: list, user_id: str) -> set:
+    """Retorna quais dos ids ja existem entre as transacoes do usuario"""
+    found = set()
+    try:
+        with SQLITE_LOCK:
+            for chunk in chunked(ids, SQLITE_MAX_PARAMS):
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id FROM transactions WHERE user_id = ? AND id IN ({placeholders})",
+                    (user_id, *chunk)
+                ).fetchall()
+                found.update(row["id"] for row in rows)
+    except Exception as e:
+        st.error(f"Erro ao verificar transacoes: {e}")
+    return found
+
+
+def load_descriptions_sqlite(conn: sqlite3.Connection, user_id: str) -> list:
+    """Carrega (id, descricao) de todas as transacoes do usuario (para o indice de busca)"""
+    try:
+        with SQLITE_LOCK:
+            return conn.execute(
+                "SELECT id, description FROM transactions WHERE user_id = ?", (user_id,)
+            ).fetchall()
+    except Exception as e:
+        st.error(f"Erro ao carregar transacoes: {e}")
+        return []
+
+
+def load_categories_sqlite(conn: sqlite3.Connection, user_id: str) -> list:
+    """Carrega (tipo, categoria, descricao) de todas as transacoes do usuario (para as sugestoes)"""
+    try:
+        with SQLITE_LOCK:
+            return conn.execute(
+                f"SELECT {CATEGORY_COLUMNS} FROM transactions WHERE user_id = ?", (user_id,)
+            ).fetchall()
+    except Exception as e:
+        st.error(f"Erro ao carregar transacoes: {e}")
+        return []
+
+
+def load_transactions_by_ids_sqlite(conn: sqlite3.Connection, ids: list, user_id: str) -> list:
+    """Carrega transacoes do usuario pelos ids, na mesma ordem de ids"""
+    found = {}
+    try:
+        with SQLITE_LOCK:
+            for chunk in chunked(ids, SQLITE_MAX_PARAMS):
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT {TRANSACTION_COLUMNS_SQLITE} FROM transactions WHERE user_id = ? AND id IN ({placeholders})",
+                    (user_id, *chunk)
+                ).fetchall()
+                found.update((row["id"], dict(row)) for row in rows)
+    except Exception as e:
+        st.error(f"Erro ao carregar transacoes: {e}")
+    return [found[i] for i in ids if i in found]
+
+
+def delete_transaction_sqlite(conn: sqlite3.Connection, transaction_id: str, user_id: str):
+    """Remove transacao do usuario"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.execute("DELETE FROM transactions WHERE id = ? AND user_id = ?", (transaction_id, user_id))
+    except Exception as e:
+        st.error(f"Erro ao excluir transacao: {e}")
+
+
+def load_goal_sqlite(conn: sqlite3.Connection, user_id: str) -> dict:
+    """Carrega meta do usuario"""
+    try:
+        with SQLITE_LOCK:
+            row = conn.execute("SELECT id, amount FROM goals WHERE user_id = ? LIMIT 1", (user_id,)).fetchone()
+        if row:
+            return dict(row)
+        return {"id": user_id, "amount": 0}
+    except Exception as e:
+        st.error(f"Erro ao carregar meta: {e}")
+        return {"id": user_id, "amount": 0}
+
+
+def save_goal_sqlite(conn: sqlite3.Connection, goal: dict, user_id: str):
+    """Salva meta do usuario (uma meta por usuario, id = user_id)"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.execute(
+                "INSERT INTO goals (id, user_id, amount) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET amount = excluded.amount",
+                (user_id, user_id, goal.get("amount", 0))
+            )
+    except Exception as e:
+        st.error(f"Erro ao salvar meta: {e}")
+
+
+def load_reminders_sqlite(conn: sqlite3.Connection, user_id: str) -> list:
+    """Carrega lembretes do usuario"""
+    try:
+        with SQLITE_LOCK:
+            rows = conn.execute(
+                f"SELECT {REMINDER_COLUMNS_SQLITE} FROM reminders WHERE user_id = ?",
+                (user_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        st.error(f"Erro ao carregar lembretes: {e}")
+        return []
+
+
+UPSERT_REMINDER_SQLITE = (
+    'INSERT INTO reminders (id, user_id, name, amount, "dueDate", notes, recurrence, "paidUntil") '
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+    'ON CONFLICT(id) DO UPDATE SET name = excluded.name, amount = excluded.amount, '
+    '"dueDate" = excluded."dueDate", notes = excluded.notes, recurrence = excluded.recurrence, '
+    '"paidUntil" = excluded."paidUntil" '
+    "WHERE reminders.user_id = excluded.user_id"
+)
+
+
+def reminder_params_sqlite(reminder: dict, user_id: str) -> tuple:
+    """Parametros do UPSERT_REMINDER_SQLITE para um lembrete"""
+    return (reminder["id"], user_id, reminder["name"], reminder.get("amount"),
+            reminder["dueDate"], reminder.get("notes"), reminder.get("recurrence"), reminder.get("paidUntil"))
+
+
+def save_reminder_sqlite(conn: sqlite3.Connection, reminder: dict, user_id: str):
+    """Salva lembrete do usuario (nao sobrescreve registro de outro usuario)"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.execute(UPSERT_REMINDER_SQLITE, reminder_params_sqlite(reminder, user_id))
+    except Exception as e:
+        st.error(f"Erro ao salvar lembrete: {e}")
+
+
+def save_reminders_sqlite(conn: sqlite3.Connection, reminders: list, user_id: str):
+    """Salva varios lembretes do usuario em uma unica transacao do banco"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.executemany(UPSERT_REMINDER_SQLITE, [reminder_params_sqlite(r, user_id) for r in reminders])
+    except Exception as e:
+        st.error(f"Erro ao salvar lembretes: {e}")
+
+
+def delete_reminder_sqlite(conn: sqlite3.Connection, reminder_id: str, user_id: str):
+    """Remove lembrete do usuario"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.execute("DELETE FROM reminders WHERE id = ? AND user_id = ?", (reminder_id, user_id))
+    except Exception as e:
+        st.error(f"Erro ao excluir lembrete: {e}")
+
+
+def delete_reminders_sqlite(conn: sqlite3.Connection, reminder_ids: list, user_id: str):
+    """Remove varios lembretes do usuario em uma unica transacao do banco"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.executemany(
+                "DELETE FROM reminders WHERE id = ? AND user_id = ?",
+                [(reminder_id, user_id) for reminder_id in reminder_ids]
+            )
+    except Exception as e:
+        st.error(f"Erro ao excluir lembretes: {e}")
+
+
+def load_recurring_rules_sqlite(conn: sqlite3.Connection, user_id: str) -> list:
+    """Carrega regras de lancamentos recorrentes do usuario"""
+    try:
+        with SQLITE_LOCK:
+            rows = conn.execute(
+                f"SELECT {RECURRING_COLUMNS_SQLITE} FROM recurring_rules WHERE user_id = ?",
+                (user_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        st.error(f"Erro ao carregar lancamentos recorrentes: {e}")
+        return []
+
+
+UPSERT_RECURRING_SQLITE = (
+    f"INSERT INTO recurring_rules (user_id, {RECURRING_COLUMNS_SQLITE}) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(id) DO UPDATE SET type = excluded.type, amount = excluded.amount, "
+    "category = excluded.category, description = excluded.description, "
+    "start_date = excluded.start_date, frequency = excluded.frequency, "
+    "end_date = excluded.end_date, materialized_until = excluded.materialized_until "
+    "WHERE recurring_rules.user_id = excluded.user_id"
+)
+
+
+def save_recurring_rules_sqlite(conn: sqlite3.Connection, rules: list, user_id: str):
+    """Salva regras recorrentes do usuario em uma unica transacao do banco"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.executemany(UPSERT_RECURRING_SQLITE, [
+                (user_id, *(rule.get(column) for column in RECURRING_COLUMNS.split(",")))
+                for rule in rules
+            ])
+    except Exception as e:
+        st.error(f"Erro ao salvar lancamentos recorrentes: {e}")
+
+
+def delete_recurring_rule_sqlite(conn: sqlite3.Connection, rule_id: str, user_id: str):
+    """Remove regra recorrente do usuario (as transacoes ja geradas ficam)"""
+    try:
+        with SQLITE_LOCK, conn:
+            conn.execute("DELETE FROM recurring_rules WHERE id = ? AND user_id = ?", (rule_id, user_id))
+    except Exception as e:
+        st.error(f"Erro ao excluir lancamento recorrente: {e}")
+
+
+# =============================================================================
+# Replica Local (sincronizacao incremental do modo cloud)
+# =============================================================================
+# Com SYNC_REPLICA = true (e a migracao 002 instalada) as leituras do modo
+# cloud saem de uma copia SQLite local. Cada sincronizacao baixa apenas as
+# linhas com updated_at depois da ultima marca (watermark) e aplica as
+# lapides de deleted_rows.
+
+REPLICA_FILE = Path(__file__).parent / "replica.db"
+
+# Intervalo minimo entre sincronizacoes do mesmo usuario (SYNC_INTERVAL_SECONDS)
+SYNC_INTERVAL_SECONDS = 30
+
+# Volta da marca a cada sincronizacao: cobre transacoes do banco que
+# gravaram updated_at antes da marca mas so confirmaram depois
+SYNC_OVERLAP_SECONDS = 60
+
+REPLICA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    user_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, table_name)
+);
+"""
+
+
+def get_replica_connection() -> sqlite3.Connection:
+    """Abre a replica local (mesmo schema do modo SQLite mais a tabela sync_state)"""
+    conn = get_sqlite_connection(get_secret("REPLICA_PATH", REPLICA_FILE))
+    conn.executescript(REPLICA_SCHEMA)
+    return conn
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Converte timestamp ISO do PostgREST (com fuso) em datetime"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def get_sync_watermark(conn: sqlite3.Connection, user_id: str, table: str) -> tuple | None:
+    """Retorna (synced_at, row_id) da ultima linha sincronizada da tabela, ou None"""
+    with SQLITE_LOCK:
+        row = conn.execute(
+            "SELECT synced_at, row_id FROM sync_state WHERE user_id = ? AND table_name = ?",
+            (user_id, table)
+        ).fetchone()
+    return (row["synced_at"], row["row_id"]) if row else None
+
+
+def set_sync_watermark(conn: sqlite3.Connection, user_id: str, table: str, watermark: tuple):
+    """Grava a marca da tabela se ela for mais recente que a atual"""
+    current = get_sync_watermark(conn, user_id, table)
+    if current is not None and parse_timestamp(current[0]) >= parse_timestamp(watermark[0]):
+        return
+    with SQLITE_LOCK, conn:
+        conn.execute(
+            "INSERT INTO sync_state (user_id, table_name, synced_at, row_id) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(user_id, table_name) DO UPDATE SET synced_at = excluded.synced_at, row_id = excluded.row_id",
+            (user_id, table, *watermark)
+        )
+
+
+def sync_changes(client: "Client", conn: sqlite3.Connection, user_id: str, table: str, columns: str,
+                 time_column: str, id_column: str, apply) -> bool:
+    """
+    Baixa as linhas da tabela alteradas desde a marca do usuario, pagina a
+    pagina, chamando apply(linhas) em cada uma. Retorna False se falhar.
+    """
+    watermark = get_sync_watermark(conn, user_id, table)
+    since = None
+    if watermark is not None:
+        since = (parse_timestamp(watermark[0]) - timedelta(seconds=SYNC_OVERLAP_SECONDS)).isoformat()
+    
+    cursor = None
+    while True:
+        page = load_changes_page_supabase(client, table, columns, user_id, time_column, id_column, since, cursor)
+        if page is None:
+            return False
+        if page:
+            apply(page)
+            cursor = (page[-1][time_column], page[-1][id_column])
+            set_sync_watermark(conn, user_id, table, cursor)
+        if len(page) < SYNC_PAGE_SIZE:
+            return True
+
+
+def apply_deleted_rows(conn: sqlite3.Connection, rows: list, user_id: str):
+    """Remove da replica as linhas com lapide"""
+    deleted = {"transactions": [], "reminders": []}
+    for row in rows:
+        if row["table_name"] in deleted:
+            deleted[row["table_name"]].append(row["row_id"])
+    if deleted["transactions"]:
+        delete_transactions_sqlite(conn, deleted["transactions"], user_id)
+    if deleted["reminders"]:
+        delete_reminders_sqlite(conn, deleted["reminders"], user_id)
+
+
+def sync_replica_supabase(client: "Client", conn: sqlite3.Connection, user_id: str,
+                          reminder_columns: str = REMINDER_COLUMNS) -> bool:
+    """
+    Sincroniza transacoes e lembretes do usuario com a replica local.
+    Custo proporcional ao que mudou desde a ultima sincronizacao; a primeira
+    baixa tudo. Lapides sao aplicadas depois das linhas alteradas.
+    """
+    return (
+        sync_changes(client, conn, user_id, "transactions", TRANSACTION_COLUMNS + ",updated_at",
+                     "updated_at", "id", lambda rows: save_transactions_sqlite(conn, rows, user_id))
+        and sync_changes(client, conn, user_id, "reminders", reminder_columns + ",updated_at",
+                         "updated_at", "id", lambda rows: save_reminders_sqlite(conn, rows, user_id))
+        and sync_changes(client, conn, user_id, "deleted_rows", "table_name,row_id,deleted_at",
+                         "deleted_at", "row_id", lambda rows: apply_deleted_rows(conn, rows, user_id))
+    )
+
+
+# =============================================================================
+# Fila de Escritas (modo cloud)
+# =============================================================================
+# Escritas do modo cloud vao primeiro para uma fila SQLite local (outbox.db)
+# e sao confirmadas na hora; uma thread envia a fila ao Supabase em lotes,
+# com nova tentativa e espera crescente quando a rede falha. Upserts por id e
+# deletes sao idempotentes: reenviar um lote apos falha parcial e seguro.
+# Enquanto ha escritas pendentes, as leituras aplicam a fila por cima.
+
+OUTBOX_FILE = Path(__file__).parent / "outbox.db"
+
+# Espera entre tentativas: dobra a cada falha, ate o maximo (segundos)
+OUTBOX_RETRY_BASE = 1.0
+OUTBOX_RETRY_MAX = 300.0
+
+# Depois de tantas falhas seguidas o lote fica marcado como falho (nao e
+# descartado) ate o usuario pedir nova tentativa
+OUTBOX_MAX_ATTEMPTS = 8
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    op TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    payload TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_user_table ON outbox(user_id, table_name);
+"""
+
+
+def get_outbox_connection() -> sqlite3.Connection:
+    """Abre a fila de escritas local (OUTBOX_PATH nos secrets)"""
+    conn = sqlite3.connect(get_secret("OUTBOX_PATH", OUTBOX_FILE), check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(OUTBOX_SCHEMA)
+    return conn
+
+
+def push_writes_supabase(client: "Client", table: str, op: str, user_id: str, rows: list):
+    """Envia um lote da fila ao Supabase; diferente das outras funcoes, propaga o erro"""
+    if op == "upsert":
+        client.table(table).upsert(rows).execute()
+    else:
+        client.table(table).delete().eq("user_id", user_id).in_("id", [r["id"] for r in rows]).execute()
+
+
+class WriteOutbox:
+    """
+    Fila persistente de escritas com envio em segundo plano.
+    Cada usuario tem sua propria fila, enviada estritamente em ordem: a
+    espera entre tentativas e por usuario, e um lote que esgotou as
+    tentativas para a fila daquele usuario (nada posterior passa na frente)
+    ate ele pedir nova tentativa ou descartar. Usuarios sem sessao
+    autenticada no processo (ex: apos reiniciar) esperam o proximo login.
+    """
+    
+    def __init__(self, get_client, conn: sqlite3.Connection, on_flush):
+        self.get_client = get_client  # get_client(user_id): cliente autenticado do usuario, ou None
+        self.conn = conn
+        self.on_flush = on_flush  # on_flush(user_id, tabela) apos cada lote enviado
+        self.lock = threading.RLock()
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="outbox", daemon=True)
+        self.thread.start()
+    
+    def enqueue(self, user_id: str, table: str, op: str, rows: list) -> bool:
+        """Grava escritas na fila (op upsert: linhas completas; delete: {"id": ...})"""
+        try:
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT INTO outbox (user_id, table_name, op, row_id, payload) VALUES (?, ?, ?, ?, ?)",
+                    [(user_id, table, op, row["id"], json.dumps(row, ensure_ascii=False)) for row in rows]
+                )
+        except Exception as e:
+            st.error(f"Erro ao gravar na fila de envio: {e}")
+            return False
+        self.wakeup.set()
+        return True
+    
+    def has_pending(self, user_id: str, table: str) -> bool:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM outbox WHERE user_id = ? AND table_name = ? LIMIT 1", (user_id, table)
+            ).fetchone() is not None
+    
+    def pending(self, user_id: str, table: str) -> tuple:
+        """Retorna (upserts por id, ids excluidos) pendentes da tabela, na ordem da fila"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT op, row_id, payload FROM outbox WHERE user_id = ? AND table_name = ? ORDER BY seq",
+                (user_id, table)
+            ).fetchall()
+        upserts, deleted = {}, set()
+        for row in rows:
+            if row["op"] == "upsert":
+                upserts[row["row_id"]] = json.loads(row["payload"])
+                deleted.discard(row["row_id"])
+            else:
+                upserts.pop(row["row_id"], None)
+                deleted.add(row["row_id"])
+        return upserts, deleted
+    
+    def stats(self, user_id: str) -> dict:
+        """Retorna quantas escritas do usuario estao pendentes/falharam e o ultimo erro"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) AS pending, COALESCE(SUM(failed), 0) AS failed, "
+                "(SELECT last_error FROM outbox WHERE user_id = ? AND last_error IS NOT NULL "
+                "ORDER BY seq DESC LIMIT 1) AS last_error "
+                "FROM outbox WHERE user_id = ?", (user_id, user_id)
+            ).fetchone()
+        return {"pending": row["pending"], "failed": row["failed"], "last_error": row["last_error"]}
+    
+    def retry_failed(self, user_id: str):
+        """Envia de novo, sem espera, as escritas do usuario que falharam ou aguardam nova tentativa"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET failed = 0, attempts = 0, next_attempt = 0 WHERE user_id = ?",
+                (user_id,)
+            )
+        self.wakeup.set()
+    
+    def discard_failed(self, user_id: str):
+        """Descarta as escritas do usuario que esgotaram as tentativas (o resto da fila segue)"""
+        with self.lock, self.conn:
+            tables = [row["table_name"] for row in self.conn.execute(
+                "SELECT DISTINCT table_name FROM outbox WHERE user_id = ? AND failed = 1", (user_id,))]
+            self.conn.execute("DELETE FROM outbox WHERE user_id = ? AND failed = 1", (user_id,))
+        for table in tables:
+            self.on_flush(user_id, table)
+        self.wakeup.set()
+    
+    def run(self):
+        """Laco da thread: envia o que estiver pronto e dorme ate a proxima tentativa"""
+        while True:
+            try:
+                delay = self.flush()
+            except Exception:
+                delay = OUTBOX_RETRY_BASE
+            self.wakeup.wait(delay)
+            self.wakeup.clear()
+    
+    def flush(self) -> float | None:
+        """
+        Envia as filas dos usuarios, um lote de cada por vez (um usuario com
+        muitas escritas ou em espera nao atrasa os outros).
+        Retorna os segundos ate a proxima tentativa, ou None se nao ha o que enviar.
+        """
+        while True:
+            with self.lock:
+                users = [row["user_id"] for row in self.conn.execute("SELECT DISTINCT user_id FROM outbox")]
+            delays = [self.flush_user(user_id) for user_id in users]
+            if 0.0 in delays:
+                continue
+            waiting = [delay for delay in delays if delay is not None]
+            return min(waiting) if waiting else None
+    
+    def flush_user(self, user_id: str) -> float | None:
+        """
+        Envia o proximo lote (mesma tabela e operacao, em ordem) da fila do usuario.
+        Retorna 0 se enviou ou falhou agora, os segundos de espera se o lote esta
+        aguardando nova tentativa, ou None se a fila esta vazia ou parada (lote
+        falho ou usuario sem sessao).
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT seq, table_name, op, payload, attempts, next_attempt, failed FROM outbox "
+                "WHERE user_id = ? ORDER BY seq LIMIT ?", (user_id, SUPABASE_BATCH_SIZE)
+            ).fetchall()
+        if not rows or rows[0]["failed"]:
+            return None
+        head = rows[0]
+        now = time.time()
+        if head["next_attempt"] > now:
+            return head["next_attempt"] - now
+        # Sem sessao o cliente base passaria pelo RLS sem afetar linha nenhuma e a escrita se perderia
+        client = self.get_client(user_id)
+        if client is None:
+            return None
+        
+        batch = []
+        for row in rows:
+            if (row["table_name"], row["op"]) != (head["table_name"], head["op"]):
+                break
+            batch.append(row)
+        # Um upsert nao pode tocar a mesma linha duas vezes: fica a versao mais recente
+        payloads = {}
+        for row in batch:
+            payload = json.loads(row["payload"])
+            payloads[payload["id"]] = payload
+        
+        try:
+            push_writes_supabase(client, head["table_name"], head["op"], user_id, list(payloads.values()))
+        except Exception as e:
+            self.fail(batch, e)
+            return 0.0
+        
+        # Invalida o cache antes de tirar da fila: quem le no meio do caminho
+        # ainda ve a escrita pendente ou ja busca a versao nova
+        self.on_flush(user_id, head["table_name"])
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM outbox WHERE seq = ?", [(row["seq"],) for row in batch])
+        return 0.0
+    
+    def fail(self, batch: list, error: Exception):
+        """Agenda nova tentativa do lote com espera exponencial (ou marca como falho)"""
+        attempts = batch[0]["attempts"] + 1
+        delay = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt = ?, failed = ?, last_error = ? WHERE seq = ?",
+                [(attempts, time.time() + delay, int(attempts >= OUTBOX_MAX_ATTEMPTS), str(error), row["seq"])
+                 for row in batch]
+            )
+
+
+def overlay_pending(rows: list, pending: tuple, keep=None) -> list:
+    """Aplica escritas pendentes (upserts, ids excluidos) sobre linhas lidas do backend"""
+    upserts, deleted = pending
+    if not upserts and not deleted:
+        return rows
+    merged = [r for r in rows if r["id"] not in deleted and r["id"] not in upserts]
+    merged.extend(r for r in upserts.values() if keep is None or keep(r))
+    return merged
+
+
+# =============================================================================
+# Cache de Leituras (modo cloud)
+# =============================================================================
+
+# Padroes do cache (ajustaveis com CACHE_TTL_SECONDS e CACHE_MAX_ENTRIES nos secrets)
+CACHE_TTL_SECONDS = 60
+CACHE_MAX_ENTRIES = 1000
+
+
+class UserDataCache:
+    """
+    Cache LRU com TTL das leituras do Supabase, compartilhado entre sessoes.
+    Toda chave comeca pelo user_id, entao um usuario nunca le dados de outro;
+    escritas do usuario invalidam as entradas dele (write-through).
+    """
+    
+    def __init__(self, ttl_seconds: float = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (user_id, tipo, args) -> (expira_em, valor)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, user_id: str, kind: str, args: tuple = ()):
+        """Retorna o valor em cache ou None (vencido ou ausente)"""
+        key = (user_id, kind, args)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def set(self, user_id: str, kind: str, args: tuple, value):
+        """Guarda valor; remove as entradas menos usadas acima do limite"""
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[(user_id, kind, args)] = (time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end((user_id, kind, args))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, user_id: str, *kinds: str):
+        """Remove entradas do usuario dos tipos informados"""
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == user_id and k[1] in kinds]:
+                del self.entries[key]
+    
+    def stats(self) -> dict:
+        """Retorna hits, misses e tamanho atual"""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+# Entradas do cache que dependem das transacoes
+TRANSACTION_CACHE_KINDS = ("transactions", "pages", "totals")
+
+# Entradas do cache invalidadas por escrita em cada tabela
+TABLE_CACHE_KINDS = {
+    "transactions": TRANSACTION_CACHE_KINDS,
+    "reminders": ("reminders",),
+    "goals": ("goal",),
+    "recurring_rules": ("recurring",)
+}
+
+
+def is_cacheable(value) -> bool:
+    """Indica se o resultado pode ir para o cache (vazio/padrao pode ser erro de consulta)"""
+    if isinstance(value, tuple):  # pagina: (linhas, cursor)
+        return bool(value[0])
+    if isinstance(value, dict):  # meta
+        return bool(value.get("amount"))
+    return bool(value)
+
+
+def copy_result(value):
+    """Copia rasa do resultado para a sessao nao alterar a lista guardada no cache"""
+    if value is None:
+        return None
+    if isinstance(value, tuple):
+        return list(value[0]), value[1]
+    if isinstance(value, dict):
+        return dict(value)
+    return list(value)
+
+
+# Consultas do painel disparadas em paralelo no modo cloud (totais, meta, lembretes, recorrentes)
+DASHBOARD_WORKERS = 4
+
+# Indices de busca mantidos em memoria no modo SQLite (um por usuario, LRU)
+SEARCH_MAX_USERS = 32
+
+# Modelos de sugestao de categoria mantidos em memoria (um por usuario, LRU)
+CATEGORY_MODEL_MAX_USERS = 32
+
+
+def run_in_script_context(ctx, load):
+    """
+    Executa load() numa thread do pool com o contexto do rerun anexado,
+    para que st.session_state (usuario logado, snapshot) funcione na thread.
+    """
+    add_script_run_ctx(threading.current_thread(), ctx)
+    return load()
+
+
+def get_cache_settings() -> tuple:
+    """Le TTL e limite de entradas do cache nos secrets"""
+    return (
+        float(get_secret("CACHE_TTL_SECONDS", CACHE_TTL_SECONDS)),
+        int(get_secret("CACHE_MAX_ENTRIES", CACHE_MAX_ENTRIES))
+    )
+
+
+# =============================================================================
+# Interface Unificada
+# =============================================================================
+
+class Database:
+    """Classe unificada para acesso ao banco de dados"""
+    
+    def __init__(self):
+        self.is_sqlite = get_secret("DATABASE_BACKEND") == "sqlite"
+        self.conn = get_sqlite_connection() if self.is_sqlite else None
+        self.pool = None if self.is_sqlite else get_supabase_pool()
+        self.is_cloud = self.pool is not None
+        self.cache = UserDataCache(*get_cache_settings())
+        self.executor = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard") if self.is_cloud else None
+        self.replica = get_replica_connection() if self.is_cloud and get_secret("SYNC_REPLICA", False) else None
+        self.sync_lock = threading.Lock()  # so para os dicionarios abaixo (nunca durante a rede)
+        self.sync_locks = {}  # user_id -> Lock da sincronizacao do usuario
+        self.synced_at = {}  # user_id -> instante da ultima sincronizacao
+        self.changed_at = {}  # user_id -> instante da ultima escrita
+        self.materialized_on = {}  # user_id -> dia da ultima materializacao de recorrentes
+        self.recurring_table = None  # modo cloud: tabela recurring_rules existe (None = ainda nao consultada)
+        self.reminder_columns = None  # modo cloud: colunas da tabela reminders (None = ainda nao consultadas)
+        self.search_indexes = OrderedDict()  # user_id -> SearchIndex (modo SQLite)
+        self.search_lock = threading.Lock()
+        self.category_models = OrderedDict()  # user_id -> CategoryModel
+        self.category_lock = threading.Lock()  # so para ler/alterar os modelos (nunca durante a carga)
+        self.category_versions = {}  # user_id -> escritas ensinadas (detecta escrita durante o treino)
+        self.data_versions = {}  # user_id -> versao dos dados (valida o snapshot das sessoes)
+        self.version_counter = count(1)
+        self.outbox = None
+        if self.is_cloud and get_secret("OUTBOX", True):
+            self.outbox = WriteOutbox(self.pool.user_client, get_outbox_connection(),
+                                      lambda user_id, table: self.mark_changed(user_id, *TABLE_CACHE_KINDS[table]))
+        
+        if not self.is_cloud and not self.is_sqlite:
+            init_local_data()
+            compact_local_data()
+    
+    def get_mode(self) -> str:
+        """Retorna modo atual: 'cloud', 'sqlite' ou 'local'"""
+        if self.is_cloud:
+            return "cloud"
+        return "sqlite" if self.is_sqlite else "local"
+    
+    @property
+    def client(self) -> "Client | None":
+        """
+        Cliente Supabase autenticado da sessao atual (o cliente base antes do
+        login). Sessao logada sem cliente (ex: servidor reiniciado) gera erro
+        em vez de consultar como anonimo: ver has_session.
+        """
+        if self.pool is None:
+            return None
+        user_id = get_user_id()
+        if user_id is None:
+            return self.pool.base
+        client = self.pool.client_for(get_session_id(), user_id)
+        if client is None:
+            raise RuntimeError("Sessao expirada: entre novamente")
+        return client
+    
+    def has_session(self) -> bool:
+        """Indica se o usuario logado ainda tem sessao no backend (so o modo cloud pode perder)"""
+        if not self.is_cloud or get_user_id() is None:
+            return True
+        return self.pool.client_for(get_session_id(), get_user_id()) is not None
+    
+    def get_client(self):
+        """Retorna cliente Supabase"""
+        return self.client
+    
+    # Autenticacao
+    def sign_up(self, email: str, password: str) -> dict:
+        if self.is_sqlite:
+            return sign_up_sqlite(self.conn, email, password)
+        if not self.is_cloud:
+            return {"success": False, "error": "Modo local nao suporta autenticacao"}
+        client = self.pool.new_client()
+        if client is None:
+            return {"success": False, "error": SUPABASE_CLIENT_ERROR}
+        result = sign_up(client, email, password)
+        if result["success"]:
+            self.pool.register(get_session_id(), result["user"].id, client)
+        return result
+    
+    def sign_in(self, email: str, password: str) -> dict:
+        if self.is_sqlite:
+            return sign_in_sqlite(self.conn, email, password)
+        if not self.is_cloud:
+            return {"success": False, "error": "Modo local nao suporta autenticacao"}
+        # Cada login ganha seu proprio cliente: a sessao de um usuario nao vaza para outro
+        client = self.pool.new_client()
+        if client is None:
+            return {"success": False, "error": SUPABASE_CLIENT_ERROR}
+        result = sign_in(client, email, password)
+        if result["success"]:
+            self.pool.register(get_session_id(), result["user"].id, client)
+            if self.outbox is not None:
+                # Escritas que ficaram sem sessao (ex: apos reiniciar) voltam a ser enviadas
+                self.outbox.wakeup.set()
+        return result
+    
+    def sign_in_with_google(self) -> dict:
+        if not self.is_cloud:
+            return {"success": False, "error": "Modo local nao suporta autenticacao"}
+        return sign_in_with_google(self.pool.base)
+    
+    def sign_out(self):
+        if self.is_cloud:
+            # So esta sessao sai: outras abas do mesmo usuario continuam logadas
+            client = self.pool.remove(get_session_id())
+            if client is not None:
+                sign_out(client)
+        st.session_state.pop("user", None)
+    
+    # Cache (modo cloud)
+    def cached_read(self, user_id: str, kind: str, args: tuple, load, cache_empty: bool = False):
+        """
+        Le do cache do usuario ou carrega com load() e guarda.
+        Resultados vazios nao sao guardados: os loaders devolvem o mesmo
+        valor padrao quando a consulta falha. cache_empty=True e para loaders
+        que sinalizam falha com None (vazio e um resultado valido).
+        """
+        value = self.cache.get(user_id, kind, args)
+        if value is None:
+            value = load()
+            if value is not None and (cache_empty or is_cacheable(value)):
+                self.cache.set(user_id, kind, args, value)
+        return copy_result(value)
+    
+    # Replica local (modo cloud)
+    def use_replica(self, user_id: str) -> bool:
+        """
+        Sincroniza a replica do usuario (no maximo uma vez por intervalo) e diz
+        se as leituras podem sair dela. Se a sincronizacao falhar, a replica so
+        e usada quando o usuario ja foi sincronizado antes (dados possivelmente
+        atrasados, mas disponiveis durante uma queda de conexao).
+        """
+        if self.replica is None:
+            return False
+        interval = float(get_secret("SYNC_INTERVAL_SECONDS", SYNC_INTERVAL_SECONDS))
+        
+        def fresh() -> bool:
+            with self.sync_lock:
+                last = self.synced_at.get(user_id)
+                return last is not None and time.monotonic() - last < interval
+        
+        if fresh():
+            return True
+        with self.sync_lock:
+            user_lock = self.sync_locks.setdefault(user_id, threading.Lock())
+        # So outro rerun do mesmo usuario espera por esta sincronizacao
+        with user_lock:
+            if fresh():
+                return True
+            started = time.monotonic()
+            if sync_replica_supabase(self.client, self.replica, user_id, self.get_reminder_columns()):
+                with self.sync_lock:
+                    # Escrita feita durante a sincronizacao pode nao ter entrado: sincroniza de novo na proxima
+                    if self.changed_at.get(user_id, 0.0) < started:
+                        self.synced_at[user_id] = started
+                return True
+            return get_sync_watermark(self.replica, user_id, "transactions") is not None
+    
+    def mark_changed(self, user_id: str, *kinds: str):
+        """Apos uma escrita: limpa o cache e forca sincronizar a replica na proxima leitura"""
+        self.cache.invalidate(user_id, *kinds)
+        self.bump_data_version(user_id)
+        with self.sync_lock:
+            self.synced_at.pop(user_id, None)
+            self.changed_at[user_id] = time.monotonic()
+    
+    # Fila de escritas (modo cloud)
+    def write_cloud(self, user_id: str, table: str, op: str, rows: list, direct):
+        """Enfileira a escrita (confirmada na hora); sem a fila, chama direct() e espera o Supabase"""
+        if op == "upsert":
+            rows = [dict(row, user_id=user_id) for row in rows]
+        if self.outbox is not None and self.outbox.enqueue(user_id, table, op, rows):
+            return
+        direct()
+        self.mark_changed(user_id, *TABLE_CACHE_KINDS[table])
+    
+    def has_pending(self, user_id: str, table: str) -> bool:
+        return self.outbox is not None and self.outbox.has_pending(user_id, table)
+    
+    def with_pending(self, user_id: str, table: str, load, keep=None) -> list:
+        """
+        Le as linhas com load() e aplica as escritas ainda na fila.
+        A fila e lida antes: se um lote for enviado no meio da leitura, o
+        cache ja foi invalidado e load() traz a versao nova.
+        """
+        pending = self.outbox.pending(user_id, table) if self.has_pending(user_id, table) else None
+        rows = load()
+        if pending is None:
+            return rows
+        return overlay_pending(rows, pending, keep)
+    
+    def get_pending_writes(self) -> dict:
+        """Retorna escritas do usuario aguardando envio ({pending, failed, last_error})"""
+        user_id = get_user_id()
+        if self.outbox is None or not user_id:
+            return {"pending": 0, "failed": 0, "last_error": None}
+        return self.outbox.stats(user_id)
+    
+    def retry_failed_writes(self):
+        """Recoloca na fila as escritas do usuario que esgotaram as tentativas"""
+        user_id = get_user_id()
+        if self.outbox is not None and user_id:
+            self.outbox.retry_failed(user_id)
+    
+    def discard_failed_writes(self):
+        """Descarta as escritas do usuario que esgotaram as tentativas, liberando as seguintes"""
+        user_id = get_user_id()
+        if self.outbox is not None and user_id:
+            self.outbox.discard_failed(user_id)
+        invalidate_snapshot()
+    
+    # Snapshot
+    def data_version(self, user_id: str | None) -> tuple:
+        """Versao atual dos dados do usuario (muda a cada escrita de transacoes ou recorrentes)"""
+        version = self.data_versions.get(user_id, 0)
+        if self.is_cloud or self.is_sqlite:
+            return (version,)
+        # Modo local: data.json e o log tambem podem mudar por fora (ex: outro processo)
+        return (version, file_stamp(DATA_FILE), file_stamp(JOURNAL_FILE))
+    
+    def bump_data_version(self, user_id: str | None):
+        """Gera uma versao nova dos dados do usuario (next do contador e atomico)"""
+        self.data_versions[user_id] = next(self.version_counter)
+    
+    def begin_rerun(self):
+        """
+        Inicio de um rerun: mantem o indice do snapshot se os dados do usuario
+        nao mudaram desde a carga. No modo cloud o snapshot vale no
+        maximo o TTL do cache, como as leituras (alteracoes de outro
+        dispositivo aparecem no mesmo prazo).
+        """
+        snapshot = get_snapshot()
+        version = self.data_version(snapshot["user_id"])
+        expired = (self.is_cloud and snapshot["loaded_at"] is not None
+                   and time.monotonic() - snapshot["loaded_at"] >= self.cache.ttl_seconds)
+        if snapshot["version"] != version or expired:
+            invalidate_snapshot()
+            snapshot["version"] = version
+            snapshot["loaded_at"] = time.monotonic()
+    
+    def written(self, before: tuple | None = None, change: tuple | None = None):
+        """
+        Apos uma escrita: gera versao nova dos dados e atualiza o snapshot da
+        sessao. Com change = (versao gravada antes, versao nova) e before (a
+        versao dos dados lida antes da escrita) aplica a escrita ao indice sem
+        nova busca; sem eles descarta o indice.
+        """
+        user_id = get_user_id()
+        self.bump_data_version(user_id)
+        snapshot = get_snapshot()
+        # Outra escrita entre a carga e esta: o indice pode estar atrasado
+        if change is None or snapshot["version"] != before:
+            invalidate_snapshot()
+            return
+        update_snapshot(*change)
+        snapshot["version"] = self.data_version(user_id)
+    
+    def stored_transaction(self, transaction_id: str) -> dict | None:
+        """
+        Versao gravada da transacao (None se nao existe), lida antes de uma
+        escrita para descontar do indice. Apenas modos local e SQLite: no cloud
+        custaria uma requisicao por escrita, e o indice e recarregado.
+        """
+        if self.is_sqlite:
+            user_id = get_user_id()
+            return load_transaction_sqlite(self.conn, transaction_id, user_id) if user_id else None
+        with LOCAL_LOCK:
+            return get_local_state()["transactions"].get(transaction_id)
+    
+    # Transacoes
+    def load_monthly_index(self, start: str | None = None, end: str | None = None) -> MonthlyIndex:
+        """
+        Retorna indice de totais por (mes, tipo, categoria) do intervalo.
+        Os totais vem agregados do backend uma vez e ficam no snapshot da
+        sessao, atualizados a cada escrita de transacao (ver written).
+        """
+        snapshot = get_snapshot()
+        if snapshot["index"] is not None and snapshot["index_range"] == (start, end):
+            return snapshot["index"]
+        
+        snapshot["index_range"] = (start, end)
+        # Ocorrencias futuras dos recorrentes entram como previsao (nao estao no banco)
+        projected = project_rows(self.load_recurring_rules(), start, end)
+        snapshot["index"] = MonthlyIndex.from_rows(self.fetch_monthly_totals(start, end) + projected)
+        return snapshot["index"]
+    
+    def load_dashboard(self, start: str | None = None, end: str | None = None) -> dict:
+        """
+        Carrega de uma vez o que o painel usa: indice de totais do intervalo,
+        meta e lembretes. No modo cloud as tres consultas rodam em paralelo,
+        entao o tempo fica proximo da consulta mais lenta e nao da soma.
+        Antes grava as ocorrencias recorrentes que venceram desde a ultima visita.
+        """
+        self.materialize_recurring()
+        loaders = {
+            "monthly_index": lambda: self.load_monthly_index(start, end),
+            "goal": self.load_goal,
+            "reminders": self.load_reminders,
+            "recurring_rules": self.load_recurring_rules
+        }
+        if self.executor is None:
+            return {name: load() for name, load in loaders.items()}
+        
+        ctx = get_script_run_ctx()
+        futures = {name: self.executor.submit(run_in_script_context, ctx, load) for name, load in loaders.items()}
+        return {name: future.result() for name, future in futures.items()}
+    
+    def fetch_monthly_totals(self, start: str | None = None, end: str | None = None) -> list:
+        """Busca linhas {month, type, category, total, count} direto no backend"""
+        if self.is_cloud:
+            user_id = get_user_id()
+            if not user_id:
+                return []
+            if self.has_pending(user_id, "transactions"):
+                # Totais do banco ainda nao incluem a fila: agrega as transacoes com ela aplicada
+                return aggregate_transactions(self.fetch_transactions(start, end))
+            if self.use_replica(user_id):
+                return load_monthly_totals_sqlite(self.replica, user_id, start, end)
+            return self.cached_read(user_id, "totals", (start, end), lambda: self.fetch_monthly_totals_supabase(user_id, start, end))
+        if self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                return load_monthly_totals_sqlite(self.conn, user_id, start, end)
+            return []
+        with LOCAL_LOCK:
+            return get_local_columns().aggregate(start, end)
+    
+    def fetch_monthly_totals_supabase(self, user_id: str, start: str | None, end: str | None) -> list:
+        """Totais via RPC; sem a RPC instalada agrega as transacoes do intervalo no cliente"""
+        rows = load_monthly_totals_supabase(self.client, start, end)
+        if rows is not None:
+            return rows
+        return aggregate_transactions(
+            load_transactions_supabase(self.client, user_id, start, end, TRANSACTION_SUMMARY_COLUMNS))
+    
+    def fetch_transactions(self, start: str | None = None, end: str | None = None) -> list:
+        """Busca transacoes no backend (ou no cache do modo cloud), sem passar pelo snapshot"""
+        if self.is_cloud:
+            user_id = get_user_id()
+            if not user_id:
+                return []
+            def load():
+                if self.use_replica(user_id):
+                    return load_transactions_sqlite(self.replica, user_id, start, end)
+                return self.cached_read(user_id, "transactions", (start, end),
+                                        lambda: load_transactions_supabase(self.client, user_id, start, end))
+            return self.with_pending(user_id, "transactions", load, lambda t: in_range((start, end), t))
+        if self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                return load_transactions_sqlite(self.conn, user_id, start, end)
+            return []
+        with LOCAL_LOCK:
+            return list(iter_local_transactions(start, end))
+    
+    def load_transactions_page(self, start: str | None = None, end: str | None = None,
+                               cursor: tuple | None = None, limit: int = 20,
+                               category: str | None = None, tipo: str | None = None) -> tuple:
+        """
+        Retorna (pagina, proximo cursor) das transacoes do intervalo, da mais recente
+        para a mais antiga. Busca apenas limit itens apos o cursor (date, id);
+        proximo cursor None indica ultima pagina.
+        """
+        user_id = get_user_id()
+        if self.is_cloud:
+            if user_id and self.has_pending(user_id, "transactions"):
+                transactions = filter_transactions(self.fetch_transactions(start, end), category, tipo)
+                return page_by_keyset(transactions, cursor, limit)
+            if user_id and self.use_replica(user_id):
+                return load_transactions_page_sqlite(self.replica, user_id, start, end, cursor, limit, category, tipo)
+            if user_id:
+                args = (start, end, tuple(cursor) if cursor else None, limit, category, tipo)
+                return self.cached_read(user_id, "pages", args, lambda: load_transactions_page_supabase(
+                    self.client, user_id, start, end, cursor, limit, category, tipo))
+            return [], None
+        if self.is_sqlite:
+            if user_id:
+                return load_transactions_page_sqlite(self.conn, user_id, start, end, cursor, limit, category, tipo)
+            return [], None
+        with LOCAL_LOCK:
+            return page_by_keyset(iter_local_transactions(start, end, category, tipo), cursor, limit)
+    
+    def save_transaction(self, transaction: dict, previous: dict | None = None):
+        """Salva a transacao; previous e a versao anterior (edicao), desfeita nas sugestoes"""
+        before = self.data_version(get_user_id())
+        old = None if self.is_cloud else self.stored_transaction(transaction["id"])
+        if self.is_cloud:
+            user_id = get_user_id()
             if user_id:
-                save_goal_supabase(self.client, goal, user_id)
+                self.write_cloud(user_id, "transactions", "upsert", [transaction],
+                                 lambda: save_transaction_supabase(self.client, transaction, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                save_transaction_sqlite(self.conn, transaction, user_id)
+                self.update_search_index(user_id, upserts=[transaction])
+        else:
+            append_journal({"op": "upsert", "collection": "transactions", "record": transaction})
+        self.written(before, None if self.is_cloud else (old, transaction))
+        if previous:
+            self.learn_categories([previous], weight=-1)
+        self.learn_categories([transaction])
+    
+    def save_transactions(self, transactions: list, learn: bool = True):
+        """
+        Salva varias transacoes de uma vez (um upsert por lote no Supabase).
+        learn=False nao ensina as categorias ao modelo de sugestoes (ex: categorias
+        que vieram da propria sugestao).
+        """
+        if not transactions:
+            return
+        if self.is_cloud:
+            user_id = get_user_id()
+            if user_id:
+                self.write_cloud(user_id, "transactions", "upsert", transactions,
+                                 lambda: save_transactions_supabase(self.client, transactions, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                save_transactions_sqlite(self.conn, transactions, user_id)
+                self.update_search_index(user_id, upserts=transactions)
         else:
-            data = load_local_data()
-            data["goal"] = goal
-            save_local_data(data)
+            append_journal_ops([
+                {"op": "upsert", "collection": "transactions", "record": t} for t in transactions
+            ])
+        self.written()
+        if learn:
+            self.learn_categories(transactions)
+    
+    def delete_transactions(self, transaction_ids: list):
+        """Remove varias transacoes de uma vez (um delete por lote no Supabase)"""
+        if not transaction_ids:
+            return
+        if self.is_cloud:
+            user_id = get_user_id()
+            if user_id:
+                self.write_cloud(user_id, "transactions", "delete", [{"id": i} for i in transaction_ids],
+                                 lambda: delete_transactions_supabase(self.client, transaction_ids, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                delete_transactions_sqlite(self.conn, transaction_ids, user_id)
+                self.update_search_index(user_id, deleted=transaction_ids)
+        else:
+            append_journal_ops([
+                {"op": "delete", "collection": "transactions", "id": transaction_id}
+                for transaction_id in transaction_ids
+            ])
+        self.written()
+    
+    # Busca
+    def search_transactions(self, query: str, limit: int = SEARCH_LIMIT) -> list:
+        """
+        Busca em todo o historico as transacoes cuja descricao casa com a
+        consulta, das mais relevantes para as menos relevantes. Cloud usa o
+        indice pg_trgm do Supabase; SQLite e local, um SearchIndex em memoria
+        atualizado a cada escrita.
+        """
+        if not query.strip():
+            return []
+        if self.is_cloud:
+            user_id = get_user_id()
+            if not user_id:
+                return []
+            def load():
+                rows = search_transactions_supabase(self.client, query, limit)
+                if rows is None:
+                    rows = search_transactions_ilike_supabase(self.client, user_id, query, limit)
+                return rows
+            return self.with_pending(user_id, "transactions", load, lambda t: matches(query, t.get("description")))
+        if self.is_sqlite:
+            user_id = get_user_id()
+            if not user_id:
+                return []
+            with self.search_lock:
+                ids = self.get_search_index(user_id).search(query, limit)
+            return load_transactions_by_ids_sqlite(self.conn, ids, user_id)
+        with LOCAL_LOCK:
+            ids = get_local_search_index().search(query, limit)
+            transactions = get_local_state()["transactions"]
+            return [transactions[i] for i in ids if i in transactions]
+    
+    def get_search_index(self, user_id: str) -> SearchIndex:
+        """Indice de busca do usuario (modo SQLite); chamar com search_lock"""
+        index = self.search_indexes.get(user_id)
+        if index is None:
+            index = SearchIndex()
+            for row in load_descriptions_sqlite(self.conn, user_id):
+                index.add(row["id"], row["description"])
+            self.search_indexes[user_id] = index
+            # Mantem apenas os indices dos usuarios usados mais recentemente
+            while len(self.search_indexes) > SEARCH_MAX_USERS:
+                self.search_indexes.popitem(last=False)
+        self.search_indexes.move_to_end(user_id)
+        return index
+    
+    def update_search_index(self, user_id: str, upserts: list = (), deleted: list = ()):
+        """Aplica uma escrita ao indice de busca do usuario, se ja montado (modo SQLite)"""
+        with self.search_lock:
+            index = self.search_indexes.get(user_id)
+            if index is None:
+                return
+            for transaction in upserts:
+                index.add(transaction["id"], transaction.get("description"))
+            for transaction_id in deleted:
+                index.remove(transaction_id)
+    
+    # Sugestao de categoria
+    def suggest_category(self, description: str, tipo: str | None = None) -> str | None:
+        """Categoria sugerida para a descricao, pelo historico do usuario (None sem evidencia)"""
+        return self.suggest_categories([(description, tipo)])[0]
+    
+    def suggest_categories(self, rows: list) -> list:
+        """Categorias sugeridas para varias (descricao, tipo) de uma vez (importacao)"""
+        if not rows:
+            return []
+        user_id = self.category_user()
+        if user_id is None:
+            return [None] * len(rows)
+        model = self.get_category_model(user_id)
+        with self.category_lock:
+            return model.predict_many(rows)
+    
+    def category_user(self) -> str | None:
+        """Chave do modelo de categorias: usuario logado (cloud/SQLite) ou "" no modo local"""
+        if self.is_cloud or self.is_sqlite:
+            return get_user_id()
+        return ""
+    
+    def get_category_model(self, user_id: str) -> CategoryModel:
+        """
+        Modelo de categorias do usuario, treinado com o historico no primeiro uso.
+        A carga e o treino rodam fora do category_lock (nao travam os outros
+        usuarios); o lock so e usado para instalar o modelo pronto.
+        """
+        with self.category_lock:
+            model = self.category_models.get(user_id)
+            if model is not None:
+                self.category_models.move_to_end(user_id)
+                return model
+            version = self.category_versions.get(user_id, 0)
+        
+        if self.is_cloud:
+            history = self.with_pending(user_id, "transactions",
+                                        lambda: load_transactions_supabase(self.client, user_id, columns=CATEGORY_COLUMNS))
+        elif self.is_sqlite:
+            history = load_categories_sqlite(self.conn, user_id)
+        else:
+            history = list(get_local_state()["transactions"].values())
+        model = CategoryModel.from_transactions(dict(row) for row in history)
+        
+        with self.category_lock:
+            # Escrita durante a carga pode ter ficado fora do historico: o modelo
+            # serve so para esta chamada e o proximo uso treina de novo
+            if self.category_versions.get(user_id, 0) != version:
+                return model
+            # Outro rerun pode ter instalado o seu primeiro
+            model = self.category_models.setdefault(user_id, model)
+            self.category_models.move_to_end(user_id)
+            # Mantem apenas os modelos dos usuarios usados mais recentemente
+            while len(self.category_models) > CATEGORY_MODEL_MAX_USERS:
+                self.category_models.popitem(last=False)
+            return model
+    
+    def learn_categories(self, transactions: list, weight: int = 1):
+        """Ensina (weight=-1 desfaz) as categorias ao modelo do usuario, se ja treinado"""
+        user_id = self.category_user()
+        if user_id is None:
+            return
+        with self.category_lock:
+            self.category_versions[user_id] = self.category_versions.get(user_id, 0) + 1
+            model = self.category_models.get(user_id)
+            if model is None:
+                return
+            for transaction in transactions:
+                model.learn(transaction, weight)
+    
+    def find_transaction_ids(self, ids: list) -> set:
+        """Retorna quais dos ids informados ja existem (para deduplicar importacoes)"""
+        if self.is_cloud:
+            user_id = get_user_id()
+            if not user_id:
+                return set()
+            found = find_transaction_ids_supabase(self.client, ids, user_id)
+            if self.has_pending(user_id, "transactions"):
+                upserts, deleted = self.outbox.pending(user_id, "transactions")
+                found = (found - deleted) | {i for i in ids if i in upserts}
+            return found
+        if self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                return find_transaction_ids_sqlite(self.conn, ids, user_id)
+            return set()
+        existing = get_local_state()["transactions"]
+        return {i for i in ids if i in existing}
+    
+    def delete_transaction(self, transaction_id: str):
+        before = self.data_version(get_user_id())
+        old = None if self.is_cloud else self.stored_transaction(transaction_id)
+        if self.is_cloud:
+            user_id = get_user_id()
+            if user_id:
+                self.write_cloud(user_id, "transactions", "delete", [{"id": transaction_id}],
+                                 lambda: delete_transaction_supabase(self.client, transaction_id, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                delete_transaction_sqlite(self.conn, transaction_id, user_id)
+                self.update_search_index(user_id, deleted=[transaction_id])
+        else:
+            append_journal({"op": "delete", "collection": "transactions", "id": transaction_id})
+        self.written(before, None if self.is_cloud else (old, None))
+    
+    # Meta
+    def load_goal(self) -> dict:
+        if self.is_cloud:
+            user_id = get_user_id()
+            if not user_id:
+                return {"amount": 0}
+            if self.has_pending(user_id, "goals"):
+                upserts, _ = self.outbox.pending(user_id, "goals")
+                if user_id in upserts:
+                    return upserts[user_id]
+            return self.cached_read(user_id, "goal", (), lambda: load_goal_supabase(self.client, user_id))
+        if self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                return load_goal_sqlite(self.conn, user_id)
+            return {"amount": 0}
+        return load_local_goal()
+    
+    def save_goal(self, goal: dict):
+        if self.is_cloud:
+            user_id = get_user_id()
+            if user_id:
+                # Uma meta por usuario: o id da meta e o proprio user_id
+                self.write_cloud(user_id, "goals", "upsert", [dict(goal, id=user_id)],
+                                 lambda: save_goal_supabase(self.client, goal, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                save_goal_sqlite(self.conn, goal, user_id)
+        else:
+            append_journal({"op": "set", "collection": "goal", "record": goal})
     
     # Lembretes
     def load_reminders(self) -> list:
         if self.is_cloud:
+            user_id = get_user_id()
+            if not user_id:
+                return []
+            def load():
+                if self.use_replica(user_id):
+                    return load_reminders_sqlite(self.replica, user_id)
+                return self.cached_read(user_id, "reminders", (), lambda: load_reminders_supabase(
+                    self.client, user_id, self.get_reminder_columns()))
+            return self.with_pending(user_id, "reminders", load)
+        if self.is_sqlite:
             user_id = get_user_id()
             if user_id:
-                return load_reminders_supabase(self.client, user_id)
+                return load_reminders_sqlite(self.conn, user_id)
             return []
-        return load_local_data().get("reminders", [])
+        return load_local_records("reminders")
+    
+    def get_reminder_columns(self) -> str:
+        """Colunas de reminders no Supabase (consultadas ate haver resposta; enquanto isso, assume a migracao 003)"""
+        if self.reminder_columns is None:
+            self.reminder_columns = load_reminder_columns_supabase(self.client)
+        return self.reminder_columns or REMINDER_COLUMNS
+    
+    def supports_reminder_column(self, column: str) -> bool:
+        """Indica se da para guardar a coluna opcional do lembrete (no cloud, depende da migracao 003)"""
+        return not self.is_cloud or column in self.get_reminder_columns().split(",")
+    
+    def fit_reminder(self, reminder: dict) -> dict:
+        """Copia do lembrete sem as colunas opcionais que a tabela do Supabase nao tem"""
+        columns = self.get_reminder_columns().split(",")
+        return {k: v for k, v in reminder.items() if k not in REMINDER_OPTIONAL_COLUMNS or k in columns}
     
     def save_reminder(self, reminder: dict):
         if self.is_cloud:
             user_id = get_user_id()
             if user_id:
-                save_reminder_supabase(self.client, reminder, user_id)
+                reminder = self.fit_reminder(reminder)
+                self.write_cloud(user_id, "reminders", "upsert", [reminder],
+                                 lambda: save_reminder_supabase(self.client, reminder, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                save_reminder_sqlite(self.conn, reminder, user_id)
         else:
-            data = load_local_data()
-            existing = next((i for i, r in enumerate(data["reminders"]) if r["id"] == reminder["id"]), None)
-            if existing is not None:
-                data["reminders"][existing] = reminder
-            else:
-                data["reminders"].append(reminder)
-            save_local_data(data)
+            append_journal({"op": "upsert", "collection": "reminders", "record": reminder})
+        invalidate_reminder_schedule()
+    
+    def save_reminders(self, reminders: list):
+        """Salva varios lembretes de uma vez (um upsert por lote no Supabase)"""
+        if not reminders:
+            return
+        if self.is_cloud:
+            user_id = get_user_id()
+            if user_id:
+                reminders = [self.fit_reminder(r) for r in reminders]
+                self.write_cloud(user_id, "reminders", "upsert", reminders,
+                                 lambda: save_reminders_supabase(self.client, reminders, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                save_reminders_sqlite(self.conn, reminders, user_id)
+        else:
+            append_journal_ops([
+                {"op": "upsert", "collection": "reminders", "record": r} for r in reminders
+            ])
+        invalidate_reminder_schedule()
     
     def delete_reminder(self, reminder_id: str):
         if self.is_cloud:
             user_id = get_user_id()
             if user_id:
-                delete_reminder_supabase(self.client, reminder_id, user_id)
+                self.write_cloud(user_id, "reminders", "delete", [{"id": reminder_id}],
+                                 lambda: delete_reminder_supabase(self.client, reminder_id, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                delete_reminder_sqlite(self.conn, reminder_id, user_id)
+        else:
+            append_journal({"op": "delete", "collection": "reminders", "id": reminder_id})
+        invalidate_reminder_schedule()
+    
+    def delete_reminders(self, reminder_ids: list):
+        """Remove varios lembretes de uma vez (um delete por lote no Supabase)"""
+        if not reminder_ids:
+            return
+        if self.is_cloud:
+            user_id = get_user_id()
+            if user_id:
+                self.write_cloud(user_id, "reminders", "delete", [{"id": i} for i in reminder_ids],
+                                 lambda: delete_reminders_supabase(self.client, reminder_ids, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                delete_reminders_sqlite(self.conn, reminder_ids, user_id)
         else:
-            data = load_local_data()
-            data["reminders"] = [r for r in data["reminders"] if r["id"] != reminder_id]
-            save_local_data(data)
+            append_journal_ops([
+                {"op": "delete", "collection": "reminders", "id": reminder_id}
+                for reminder_id in reminder_ids
+            ])
+        invalidate_reminder_schedule()
+    
+    def mark_reminder_paid(self, reminder: dict, due: date):
+        """Marca como paga a ocorrencia de um lembrete recorrente (e as anteriores)"""
+        self.save_reminder(dict(reminder, paidUntil=due.isoformat()))
+    
+    def get_reminder_schedule(self, reminders: list) -> ReminderSchedule:
+        """
+        Agenda dos lembretes, reaproveitada entre reruns da sessao enquanto a
+        lista for a mesma (escritas de lembretes descartam a agenda guardada).
+        """
+        cached = st.session_state.get(REMINDER_SCHEDULE_KEY)
+        user_id = get_user_id()
+        if cached is None or cached["user_id"] != user_id or cached["reminders"] != reminders:
+            cached = {"user_id": user_id, "reminders": list(reminders), "schedule": ReminderSchedule(reminders)}
+            st.session_state[REMINDER_SCHEDULE_KEY] = cached
+        return cached["schedule"]
+    
+    # Lancamentos recorrentes
+    def load_recurring_rules(self) -> list:
+        if self.is_cloud:
+            user_id = get_user_id()
+            if not user_id:
+                return []
+            def load():
+                rules = load_recurring_rules_supabase(self.client, user_id)
+                # Sem a migracao 004 a opcao de repetir sai do formulario (ver supports_recurring)
+                self.recurring_table = rules is not None
+                return rules
+            return self.with_pending(user_id, "recurring_rules", lambda: self.cached_read(
+                user_id, "recurring", (), load, cache_empty=True
+            ) or [])
+        if self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                return load_recurring_rules_sqlite(self.conn, user_id)
+            return []
+        return load_local_records("recurring")
+    
+    def supports_recurring(self) -> bool:
+        """Indica se da para cadastrar lancamentos recorrentes (no cloud, depende da migracao 004)"""
+        if not self.is_cloud:
+            return True
+        if self.recurring_table is None:
+            self.load_recurring_rules()
+        return bool(self.recurring_table)
+    
+    def save_recurring_rules(self, rules: list):
+        """Salva varias regras de uma vez (um upsert por lote no Supabase)"""
+        if not rules:
+            return
+        if self.is_cloud:
+            user_id = get_user_id()
+            if user_id:
+                self.write_cloud(user_id, "recurring_rules", "upsert", rules,
+                                 lambda: save_recurring_rules_supabase(self.client, rules, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                save_recurring_rules_sqlite(self.conn, rules, user_id)
+        else:
+            append_journal_ops([
+                {"op": "upsert", "collection": "recurring", "record": r} for r in rules
+            ])
+        self.written()
+    
+    def save_recurring_rule(self, rule: dict):
+        """Salva a regra e ja grava as ocorrencias ate hoje"""
+        self.save_recurring_rules([rule])
+        self.materialize_recurring(force=True)
+    
+    def delete_recurring_rule(self, rule_id: str):
+        """Encerra a regra: as transacoes ja gravadas ficam, as previsoes somem"""
+        if self.is_cloud:
+            user_id = get_user_id()
+            if user_id:
+                self.write_cloud(user_id, "recurring_rules", "delete", [{"id": rule_id}],
+                                 lambda: delete_recurring_rule_supabase(self.client, rule_id, user_id))
+        elif self.is_sqlite:
+            user_id = get_user_id()
+            if user_id:
+                delete_recurring_rule_sqlite(self.conn, rule_id, user_id)
+        else:
+            append_journal({"op": "delete", "collection": "recurring", "id": rule_id})
+        self.written()
+    
+    def materialize_recurring(self, force: bool = False):
+        """
+        Grava como transacoes as ocorrencias recorrentes ate hoje, num unico
+        lote por usuario, e avanca materialized_until das regras. Roda no
+        maximo uma vez por dia por usuario (force ignora o limite).
+        """
+        user_id = get_user_id()
+        today = date.today()
+        if not force and self.materialized_on.get(user_id) == today:
+            return
+        if (self.is_cloud or self.is_sqlite) and not user_id:
+            return
+        transactions, rules = materialize(self.load_recurring_rules(), today)
+        # Transacoes antes das regras: se parar no meio, os ids deterministicos
+        # fazem a proxima materializacao regravar as mesmas linhas
+        self.save_transactions(transactions)
+        self.save_recurring_rules(rules)
+        self.materialized_on[user_id] = today
 
 
 @st.cache_resource
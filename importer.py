@@ -0,0 +1,257 @@
+"""
+Importacao de extratos bancarios (CSV e OFX).
+Le o arquivo em blocos, converte cada lancamento para o formato de transacao
+do app (id, type, amount, date, category, description), descarta os que ja
+existem e grava o restante em lotes com Database.save_transactions.
+Categorias do extrato sao trazidas para as categorias do app (sem diferenciar
+acentos e maiusculas); lancamentos sem categoria, ou com uma que o app nao
+tem, recebem a sugerida pelo historico do usuario
+(Database.suggest_categories), ou DEFAULT_CATEGORY.
+"""
+
+import csv
+import io
+import re
+import unicodedata
+import uuid
+from datetime import datetime
+
+from database import get_user_id
+
+# Lancamentos processados e gravados por vez
+CHUNK_SIZE = 1000
+
+# Categoria usada quando o extrato nao informa uma e nao ha sugestao
+DEFAULT_CATEGORY = "Outros"
+
+# Namespace dos ids deterministicos: reimportar o mesmo extrato gera os mesmos ids
+IMPORT_NAMESPACE = uuid.UUID("6f1c1e52-8d0b-4b7e-9a51-3f0c2d9e7a10")
+
+# Nomes de coluna aceitos no CSV (sem acento, minusculo)
+CSV_COLUMNS = {
+    "date": ["data", "date", "data lancamento", "data do lancamento", "data movimento"],
+    "amount": ["valor", "amount", "value", "valor (r$)", "quantia"],
+    "description": ["descricao", "description", "historico", "lancamento", "memo", "detalhes"],
+    "category": ["categoria", "category"],
+    "type": ["tipo", "type", "natureza"]
+}
+
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d/%m/%y", "%d-%m-%Y", "%Y%m%d"]
+
+
+def normalize_text(text):
+    """Remove acentos, espacos extras e deixa em minusculo"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.lower().split())
+
+
+def parse_amount(text):
+    """Converte valores como '1.234,56', '-12.50' ou 'R$ 10,00' para float"""
+    text = str(text).strip().replace("R$", "").replace(" ", "")
+    negative = text.startswith("(") and text.endswith(")")
+    text = text.strip("()")
+    if "," in text and "." in text:
+        # O separador que aparece por ultimo e o decimal
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif "," in text:
+        text = text.replace(",", ".")
+    value = float(text)
+    return -value if negative else value
+
+
+def parse_date(text):
+    """Converte datas do extrato para YYYY-MM-DD"""
+    text = str(text).strip()
+    # OFX: 20240131120000[-3:BRT]
+    if re.match(r"^\d{8}", text):
+        text = text[:8]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"Data invalida: {text}")
+
+
+def make_transaction(dt, amount, description, category=None, tipo=None, key=None, owner=""):
+    """
+    Monta a transacao no formato do app (category None = a preencher na importacao).
+    key identifica o lancamento no extrato (FITID ou ocorrencia) e, junto com o
+    usuario (owner), gera o id deterministico.
+    """
+    if tipo is None:
+        tipo = "income" if amount > 0 else "expense"
+    description = " ".join((description or "").split())[:60] or "Sem descricao"
+    return {
+        "id": str(uuid.uuid5(IMPORT_NAMESPACE, f"{owner}|{dt}|{amount:.2f}|{normalize_text(description)}|{key}")),
+        "type": tipo,
+        "amount": round(abs(amount), 2),
+        "date": dt,
+        "category": category or None,
+        "description": description
+    }
+
+
+def match_category(text, categories):
+    """Categoria do app que corresponde ao texto do extrato (ex: 'ALIMENTAÇÃO'), ou None"""
+    wanted = normalize_text(text)
+    if not wanted:
+        return None
+    for category in categories:
+        if normalize_text(category) == wanted:
+            return category
+    return None
+
+
+def open_text(file):
+    """Abre arquivo binario como texto (UTF-8, ou Latin-1 comum em bancos brasileiros)"""
+    head = file.read(64 * 1024)
+    file.seek(0)
+    try:
+        head.decode("utf-8")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+    return io.TextIOWrapper(file, encoding=encoding, errors="replace", newline="")
+
+
+def match_columns(header):
+    """Mapeia campos da transacao para a posicao da coluna no cabecalho do CSV"""
+    normalized = [normalize_text(h) for h in header]
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        for i, name in enumerate(normalized):
+            if name in aliases:
+                columns[field] = i
+                break
+    return columns
+
+
+def parse_type(text):
+    """Interpreta coluna de tipo (credito/debito, receita/despesa)"""
+    text = normalize_text(text)
+    if text in ("c", "credito", "receita", "income", "entrada"):
+        return "income"
+    if text in ("d", "debito", "despesa", "expense", "saida"):
+        return "expense"
+    return None
+
+
+def iter_csv(text_stream, stats, owner=""):
+    """Gera transacoes linha a linha de um CSV (delimitador detectado automaticamente)"""
+    sample = text_stream.read(8192)
+    text_stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text_stream, dialect)
+
+    header = next(reader, None)
+    columns = match_columns(header or [])
+    if not {"date", "amount", "description"} <= columns.keys():
+        raise ValueError("CSV precisa das colunas data, valor e descricao")
+
+    occurrences = {}
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        stats["read"] += 1
+        try:
+            dt = parse_date(row[columns["date"]])
+            amount = parse_amount(row[columns["amount"]])
+            description = row[columns["description"]]
+            tipo = parse_type(row[columns["type"]]) if "type" in columns else None
+            category = row[columns["category"]].strip() if "category" in columns else None
+        except (ValueError, IndexError):
+            stats["invalid"] += 1
+            continue
+        # Lancamentos identicos no mesmo extrato sao distintos: numera as ocorrencias
+        base = (dt, round(amount, 2), normalize_text(description))
+        occurrences[base] = occurrences.get(base, 0) + 1
+        yield make_transaction(dt, amount, description, category, tipo, key=occurrences[base], owner=owner)
+
+
+def iter_ofx(text_stream, stats, owner=""):
+    """Gera transacoes dos blocos <STMTTRN> de um OFX, lendo o arquivo em pedacos"""
+    buffer = ""
+    for chunk in iter(lambda: text_stream.read(64 * 1024), ""):
+        buffer += chunk
+        while True:
+            start = buffer.find("<STMTTRN>")
+            end = buffer.find("</STMTTRN>", start)
+            if start < 0 or end < 0:
+                break
+            block = buffer[start:end]
+            buffer = buffer[end + len("</STMTTRN>"):]
+            stats["read"] += 1
+            fields = {tag.upper(): value.strip() for tag, value in re.findall(r"<(\w+)>([^<\r\n]*)", block)}
+            try:
+                dt = parse_date(fields["DTPOSTED"])
+                amount = parse_amount(fields["TRNAMT"])
+            except (KeyError, ValueError):
+                stats["invalid"] += 1
+                continue
+            description = fields.get("MEMO") or fields.get("NAME", "")
+            yield make_transaction(dt, amount, description, key=fields.get("FITID"), owner=owner)
+        # Mantem apenas o que pode ser inicio de um bloco ainda incompleto
+        buffer = buffer[start:] if start >= 0 else buffer[-len("<STMTTRN>"):]
+
+
+def iter_chunks(items, size):
+    """Agrupa um iterador em listas de ate size itens"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_statement(db, file, filename, categories, chunk_size=CHUNK_SIZE):
+    """
+    Importa extrato CSV ou OFX para o usuario atual.
+    categories sao as categorias do app (DEFAULT_CATEGORY deve estar entre elas):
+    toda transacao importada termina em uma delas.
+    Retorna contadores: lidos, importados, duplicados, invalidos e categorias sugeridas.
+    """
+    stats = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "suggested": 0}
+    # ids sao unicos na tabela inteira: o mesmo extrato de outro usuario gera ids diferentes
+    owner = get_user_id() or ""
+    text_stream = open_text(file)
+    if filename.lower().endswith(".ofx"):
+        rows = iter_ofx(text_stream, stats, owner)
+    else:
+        rows = iter_csv(text_stream, stats, owner)
+
+    for chunk in iter_chunks(rows, chunk_size):
+        existing = db.find_transaction_ids([t["id"] for t in chunk])
+        new_rows = [t for t in chunk if t["id"] not in existing]
+        stats["duplicates"] += len(chunk) - len(new_rows)
+        given = []
+        missing = []
+        for transaction in new_rows:
+            raw = transaction["category"]
+            transaction["category"] = match_category(raw, categories)
+            if transaction["category"]:
+                given.append(transaction)
+            else:
+                # Uma categoria desconhecida (ex: 'Supermercado') ainda ajuda a sugestao
+                missing.append((transaction, f"{transaction['description']} {raw or ''}"))
+        suggestions = db.suggest_categories([(text, t["type"]) for t, text in missing])
+        suggestions = [category if category in categories else None for category in suggestions]
+        for (transaction, _), category in zip(missing, suggestions):
+            transaction["category"] = category or DEFAULT_CATEGORY
+        stats["suggested"] += sum(1 for category in suggestions if category)
+        db.save_transactions(new_rows, learn=False)
+        # So as categorias do proprio extrato ensinam o modelo; as sugeridas nao
+        db.learn_categories(given)
+        stats["imported"] += len(new_rows)
+
+    return stats
@@ -0,0 +1,29 @@
+-- Totais do dashboard agregados no banco
+-- Execute no SQL Editor do Supabase depois do script principal (README)
+--
+-- Retorna uma linha por (mes, tipo, categoria) com soma e quantidade,
+-- para o Resumo nao precisar baixar todas as transacoes do periodo.
+-- Parametros NULL significam intervalo aberto.
+
+CREATE OR REPLACE FUNCTION dashboard_totals(start_date DATE, end_date DATE)
+RETURNS TABLE (month TEXT, type TEXT, category TEXT, total NUMERIC, count BIGINT)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT to_char(t.date, 'YYYY-MM') AS month,
+           t.type,
+           t.category,
+           SUM(t.amount) AS total,
+           COUNT(*) AS count
+    FROM transactions t
+    WHERE t.user_id = auth.uid()
+      AND (start_date IS NULL OR t.date >= start_date)
+      AND (end_date IS NULL OR t.date < end_date)
+    GROUP BY 1, 2, 3
+$$;
+
+GRANT EXECUTE ON FUNCTION dashboard_totals(DATE, DATE) TO authenticated;
+
+-- Indice para filtros por usuario e periodo
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user_id, date);
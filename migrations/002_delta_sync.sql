@@ -0,0 +1,97 @@
+-- Sincronizacao incremental (delta sync) com a replica local
+-- Execute no SQL Editor do Supabase depois do 001_dashboard_totals.sql
+--
+-- Cada linha de transactions/reminders ganha updated_at, mantido por trigger.
+-- Exclusoes deixam uma lapide (tombstone) em deleted_rows. O app baixa
+-- apenas o que mudou desde a ultima sincronizacao (ver SYNC_REPLICA no README).
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_updated_at ON transactions;
+CREATE TRIGGER transactions_updated_at
+    BEFORE INSERT OR UPDATE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+DROP TRIGGER IF EXISTS reminders_updated_at ON reminders;
+CREATE TRIGGER reminders_updated_at
+    BEFORE INSERT OR UPDATE ON reminders
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+-- Lapides das linhas excluidas
+CREATE TABLE IF NOT EXISTS deleted_rows (
+    table_name TEXT NOT NULL,
+    row_id TEXT NOT NULL,
+    user_id UUID NOT NULL,
+    deleted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    PRIMARY KEY (table_name, row_id)
+);
+
+CREATE OR REPLACE FUNCTION record_deleted_row()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id, user_id)
+    VALUES (TG_TABLE_NAME, OLD.id, OLD.user_id)
+    ON CONFLICT (table_name, row_id)
+    DO UPDATE SET user_id = EXCLUDED.user_id, deleted_at = clock_timestamp();
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_deleted ON transactions;
+CREATE TRIGGER transactions_deleted
+    AFTER DELETE ON transactions
+    FOR EACH ROW EXECUTE FUNCTION record_deleted_row();
+
+DROP TRIGGER IF EXISTS reminders_deleted ON reminders;
+CREATE TRIGGER reminders_deleted
+    AFTER DELETE ON reminders
+    FOR EACH ROW EXECUTE FUNCTION record_deleted_row();
+
+-- Um id excluido e inserido de novo (ex: extrato reimportado) perde a lapide
+CREATE OR REPLACE FUNCTION clear_deleted_row()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM deleted_rows WHERE table_name = TG_TABLE_NAME AND row_id = NEW.id;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_undeleted ON transactions;
+CREATE TRIGGER transactions_undeleted
+    AFTER INSERT ON transactions
+    FOR EACH ROW EXECUTE FUNCTION clear_deleted_row();
+
+DROP TRIGGER IF EXISTS reminders_undeleted ON reminders;
+CREATE TRIGGER reminders_undeleted
+    AFTER INSERT ON reminders
+    FOR EACH ROW EXECUTE FUNCTION clear_deleted_row();
+
+-- Usuarios so leem as proprias lapides (gravadas apenas pelo trigger)
+ALTER TABLE deleted_rows ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own deleted rows" ON deleted_rows
+    FOR SELECT USING (auth.uid() = user_id);
+
+-- Indices para buscar o que mudou desde a ultima sincronizacao
+CREATE INDEX IF NOT EXISTS idx_transactions_user_updated ON transactions(user_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_reminders_user_updated ON reminders(user_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_deleted_rows_user ON deleted_rows(user_id, deleted_at);
@@ -0,0 +1,13 @@
+-- Lembretes recorrentes (contas mensais/anuais)
+-- Execute no SQL Editor do Supabase depois do 002_delta_sync.sql
+--
+-- recurrence: NULL (nao repete), 'monthly' ou 'yearly'. As ocorrencias sao
+-- calculadas no app a partir de "dueDate"; o banco guarda uma linha por conta.
+
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS recurrence TEXT
+    CHECK (recurrence IN ('monthly', 'yearly'));
+
+-- "paidUntil": vencimento da ultima ocorrencia marcada como paga; as
+-- ocorrencias ate essa data saem da agenda. Pode rodar de novo em bancos
+-- que ja tinham a coluna recurrence.
+ALTER TABLE reminders ADD COLUMN IF NOT EXISTS "paidUntil" DATE;
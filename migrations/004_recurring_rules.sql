@@ -0,0 +1,36 @@
+-- Lancamentos recorrentes (salario, aluguel, assinaturas)
+-- Execute no SQL Editor do Supabase depois do 003_recurring_reminders.sql
+--
+-- Cada regra gera no app as transacoes das ocorrencias ate hoje (em lote,
+-- com ids deterministicos) e avanca materialized_until; as ocorrencias
+-- futuras entram nos totais apenas como previsao. Sem esta tabela o app
+-- continua funcionando, sem a opcao de repetir.
+
+CREATE TABLE IF NOT EXISTS recurring_rules (
+    id TEXT PRIMARY KEY,
+    user_id UUID NOT NULL,
+    type TEXT NOT NULL CHECK (type IN ('income', 'expense')),
+    amount DECIMAL(10,2) NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT,
+    start_date DATE NOT NULL,
+    frequency TEXT NOT NULL CHECK (frequency IN ('monthly', 'yearly')),
+    end_date DATE,
+    materialized_until DATE
+);
+
+CREATE INDEX IF NOT EXISTS idx_recurring_rules_user ON recurring_rules(user_id);
+
+ALTER TABLE recurring_rules ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own recurring rules" ON recurring_rules
+    FOR SELECT USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own recurring rules" ON recurring_rules
+    FOR INSERT WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own recurring rules" ON recurring_rules
+    FOR UPDATE USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete own recurring rules" ON recurring_rules
+    FOR DELETE USING (auth.uid() = user_id);
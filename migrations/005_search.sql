@@ -0,0 +1,41 @@
+-- Busca textual nas descricoes das transacoes
+-- Execute no SQL Editor do Supabase depois do 004_recurring_rules.sql
+--
+-- Indice de trigramas (pg_trgm) sobre a descricao sem acentos e em
+-- minusculas: a busca casa partes de palavras e tolera erros de digitacao.
+-- O indice e mantido pelo proprio Postgres a cada insert/update/delete.
+-- Sem esta migracao o app busca com ILIKE (sem tolerancia a erros).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent nao e IMMUTABLE; o wrapper permite usa-lo no indice
+CREATE OR REPLACE FUNCTION search_text(value TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT lower(public.unaccent('public.unaccent', coalesce(value, '')))
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_description_trgm
+    ON transactions USING gin (search_text(description) gin_trgm_ops);
+
+-- Retorna as transacoes do usuario que casam com a consulta, das mais
+-- parecidas para as menos parecidas (empate: mais recentes primeiro)
+CREATE OR REPLACE FUNCTION search_transactions(query TEXT, max_results INT DEFAULT 50)
+RETURNS TABLE (id TEXT, type TEXT, amount NUMERIC, date DATE, category TEXT, description TEXT)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER
+AS $$
+    SELECT t.id, t.type, t.amount, t.date, t.category, t.description
+    FROM transactions t
+    WHERE t.user_id = auth.uid()
+      AND search_text(query) <% search_text(t.description)
+    ORDER BY word_similarity(search_text(query), search_text(t.description)) DESC, t.date DESC, t.id DESC
+    LIMIT max_results
+$$;
+
+GRANT EXECUTE ON FUNCTION search_transactions(TEXT, INT) TO authenticated;
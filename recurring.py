@@ -0,0 +1,100 @@
+"""
+Lancamentos recorrentes (salario, aluguel, assinaturas).
+Uma regra guarda o lancamento-modelo, a data inicial, a frequencia e ate
+onde ja foi materializada (materialized_until). Ocorrencias ate hoje viram
+transacoes de verdade, gravadas em lote; as futuras so entram nos totais
+como previsao, sem ocupar espaco no banco.
+"""
+
+import uuid
+from datetime import date, timedelta
+
+from reminders import RECURRENCES, occurrences
+
+# Campos da transacao copiados da regra em cada ocorrencia
+RULE_FIELDS = ("type", "amount", "category", "description")
+
+# Limite das previsoes quando o intervalo pedido nao tem fim
+PROJECTION_YEARS = 5
+
+
+def new_rule(transaction, frequency):
+    """Cria regra a partir de uma transacao do formulario (a data vira o inicio)"""
+    if frequency not in RECURRENCES:
+        raise ValueError(f"Frequencia invalida: {frequency}")
+    rule = {field: transaction[field] for field in RULE_FIELDS}
+    rule.update(
+        id=str(uuid.uuid4()),
+        start_date=transaction["date"],
+        frequency=frequency,
+        end_date=None,
+        materialized_until=None
+    )
+    return rule
+
+
+def occurrence_id(rule, when):
+    """
+    Id da transacao gerada pela regra na data: deterministico, entao gerar a
+    mesma ocorrencia duas vezes (ex: duas sessoes abertas) vira um upsert.
+    """
+    return str(uuid.uuid5(uuid.UUID(rule["id"]), when.isoformat()))
+
+
+def rule_dates(rule, start, end):
+    """
+    Datas da regra com start <= data < end, respeitando end_date e pulando
+    o que ja foi materializado.
+    """
+    if rule.get("materialized_until"):
+        start = max(start, date.fromisoformat(rule["materialized_until"]) + timedelta(days=1))
+    if rule.get("end_date"):
+        end = min(end, date.fromisoformat(rule["end_date"]) + timedelta(days=1))
+    if start >= end:
+        return iter(())
+    return occurrences(date.fromisoformat(rule["start_date"]), rule["frequency"], start, end)
+
+
+def to_transaction(rule, when):
+    """Transacao da ocorrencia da regra na data"""
+    transaction = {field: rule[field] for field in RULE_FIELDS}
+    transaction.update(id=occurrence_id(rule, when), date=when.isoformat())
+    return transaction
+
+
+def materialize(rules, today):
+    """
+    Gera as transacoes das ocorrencias ate today (inclusive) ainda nao
+    gravadas. Retorna (transacoes, regras com materialized_until atualizado);
+    regras sem ocorrencia nova nao sao regravadas.
+    """
+    transactions = []
+    updated = []
+    end = today + timedelta(days=1)
+    for rule in rules:
+        generated = [to_transaction(rule, when) for when in rule_dates(rule, date.min, end)]
+        if generated:
+            transactions.extend(generated)
+            updated.append(dict(rule, materialized_until=today.isoformat()))
+    return transactions, updated
+
+
+def project_rows(rules, start, end):
+    """
+    Ocorrencias ainda nao materializadas com start <= data < end (YYYY-MM-DD),
+    agregadas em linhas {month, type, category, total, count} como as de
+    aggregate_transactions. Sem end, vai ate PROJECTION_YEARS anos a frente.
+    """
+    start = date.fromisoformat(start) if start else date.min
+    end = date.fromisoformat(end) if end else date.today().replace(year=date.today().year + PROJECTION_YEARS, day=1)
+    totals = {}
+    for rule in rules:
+        amount = float(rule["amount"])
+        for when in rule_dates(rule, start, end):
+            key = (when.strftime("%Y-%m"), rule["type"], rule["category"])
+            total, count = totals.get(key, (0.0, 0))
+            totals[key] = (total + amount, count + 1)
+    return [
+        {"month": month, "type": tipo, "category": category, "total": total, "count": count}
+        for (month, tipo, category), (total, count) in totals.items()
+    ]
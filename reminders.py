@@ -0,0 +1,121 @@
+"""
+Agenda de lembretes (contas a pagar).
+Lembretes podem repetir todo mes ou todo ano (campo recurrence); as
+ocorrencias sao geradas sob demanda, apenas dentro da janela exibida.
+Recorrentes marcados como pagos guardam a data da ultima ocorrencia paga
+(paidUntil); ocorrencias ate ela saem da agenda.
+O ReminderSchedule guarda os vencimentos ja convertidos para date e
+ordenados, e responde vencidos / a vencer / em dia com buscas binarias.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from heapq import merge
+from itertools import islice
+
+from dateutil.relativedelta import relativedelta
+
+# Regras de repeticao: intervalo em meses
+RECURRENCES = {"monthly": 1, "yearly": 12}
+
+RECURRENCE_LABELS = {None: "Nao repete", "monthly": "Mensal", "yearly": "Anual"}
+
+# Dias ate o vencimento para o lembrete contar como "vence em breve"
+DUE_SOON_DAYS = 7
+
+
+def occurrences(due, recurrence, start, end):
+    """
+    Gera as datas de vencimento em start <= data < end.
+    Cada ocorrencia e calculada a partir da data original, entao um
+    vencimento no dia 31 cai no ultimo dia dos meses mais curtos.
+    """
+    step = RECURRENCES.get(recurrence)
+    if step is None:
+        if start <= due < end:
+            yield due
+        return
+    # Pula direto para a primeira ocorrencia possivel da janela
+    months = max(0, (start.year - due.year) * 12 + start.month - due.month)
+    k = months // step
+    while True:
+        current = due + relativedelta(months=k * step)
+        if current >= end:
+            return
+        if current >= start:
+            yield current
+        k += 1
+
+
+class ReminderSchedule:
+    """
+    Indice dos lembretes por vencimento.
+    Lembretes unicos ficam numa lista ordenada de (data, id); os recorrentes
+    sao expandidos apenas na janela pedida, a partir do dia seguinte ao
+    ultimo pagamento.
+    """
+
+    def __init__(self, reminders):
+        self.by_id = {}
+        self.once = []       # [(data, id)] ordenado
+        self.recurring = []  # [(data original, id, pago ate)]
+        for reminder in reminders:
+            due = date.fromisoformat(reminder["dueDate"][:10])
+            self.by_id[reminder["id"]] = reminder
+            if reminder.get("recurrence") in RECURRENCES:
+                paid = reminder.get("paidUntil")
+                self.recurring.append((due, reminder["id"], date.fromisoformat(paid[:10]) if paid else None))
+            else:
+                self.once.append((due, reminder["id"]))
+        self.once.sort()
+        self.once_dates = [due for due, _ in self.once]
+
+    def between(self, start, end):
+        """Retorna [(data, lembrete)] com start <= data < end, em ordem de vencimento"""
+        first = bisect_left(self.once_dates, start)
+        last = bisect_left(self.once_dates, end)
+        once = self.once[first:last]
+        expanded = sorted(
+            (when, reminder_id)
+            for due, reminder_id, paid in self.recurring
+            for when in occurrences(due, self.by_id[reminder_id].get("recurrence"),
+                                    start if paid is None else max(start, paid + timedelta(days=1)), end)
+        )
+        return [(when, self.by_id[reminder_id]) for when, reminder_id in merge(once, expanded)]
+
+    def agenda(self, today, horizon_days, history_start=None):
+        """
+        Agrupa as ocorrencias por situacao: {"overdue", "due_soon", "ok", "later"}.
+        Lembretes unicos aparecem sempre: os que vencem depois da janela
+        ficam em "later". Recorrentes aparecem a partir de history_start
+        (padrao: inicio do mes atual) ate o fim da janela, today + horizon_days;
+        os que nao vencem na janela (ex: anual ja pago) aparecem em "later"
+        pela proxima ocorrencia.
+        """
+        if history_start is None:
+            history_start = today.replace(day=1)
+        end = today + timedelta(days=horizon_days + 1)
+        soon = today + timedelta(days=DUE_SOON_DAYS + 1)
+
+        # Unicos vencidos: prefixo da lista ordenada
+        overdue = [(due, self.by_id[i]) for due, i in self.once[:bisect_left(self.once_dates, history_start)]]
+        window = self.between(history_start, end)
+        dates = [when for when, _ in window]
+        split_today = bisect_left(dates, today)
+        split_soon = bisect_right(dates, soon - timedelta(days=1))
+        shown = {reminder["id"] for _, reminder in window}
+        later = list(self.once[bisect_left(self.once_dates, end):])
+        for due, reminder_id, paid in self.recurring:
+            if reminder_id in shown:
+                continue
+            start = end if paid is None else max(end, paid + timedelta(days=1))
+            months = RECURRENCES[self.by_id[reminder_id]["recurrence"]]
+            later.extend((when, reminder_id) for when in islice(
+                occurrences(due, self.by_id[reminder_id]["recurrence"], start, start + relativedelta(months=months + 1)), 1))
+        later.sort()
+        return {
+            "overdue": overdue + window[:split_today],
+            "due_soon": window[split_today:split_soon],
+            "ok": window[split_soon:],
+            "later": [(when, self.by_id[reminder_id]) for when, reminder_id in later]
+        }
@@ -0,0 +1,181 @@
+"""
+Busca textual nas descricoes (transacoes) e nomes/observacoes (lembretes).
+SearchIndex e um indice invertido token -> ids, atualizado a cada escrita
+(add/remove), com busca por prefixo e aproximada: cada palavra da consulta
+casa com palavras do vocabulario que compartilham trigramas (tolera erros de
+digitacao, como o pg_trgm do modo cloud). Acentos e maiusculas sao ignorados.
+"""
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from itertools import islice
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Similaridade minima (trigramas em comum / trigramas distintos) para o casamento aproximado
+FUZZY_THRESHOLD = 0.4
+
+# Peso de cada tipo de casamento de uma palavra da consulta
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+
+# Resultados retornados por busca
+SEARCH_LIMIT = 50
+
+
+def normalize(text):
+    """Minusculas e sem acentos"""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    """Palavras normalizadas do texto"""
+    return TOKEN_PATTERN.findall(normalize(text))
+
+
+def trigrams(token):
+    """Trigramas da palavra com bordas marcadas (como o pg_trgm)"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Indice invertido de um conjunto de documentos (id -> texto)"""
+
+    def __init__(self):
+        self.postings = {}      # palavra -> {ids}
+        self.documents = {}     # id -> {palavras}
+        self.vocabulary = []    # palavras em ordem (busca por prefixo)
+        self.by_trigram = {}    # trigrama -> {palavras}
+        self.trigram_counts = {}  # palavra -> quantidade de trigramas
+
+    @classmethod
+    def from_records(cls, records, fields):
+        """Indexa registros {id, ...} pelo texto dos campos informados"""
+        index = cls()
+        for record in records:
+            index.add(record["id"], " ".join(record.get(field) or "" for field in fields))
+        return index
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, text):
+        """Indexa (ou reindexa) o documento"""
+        self.remove(doc_id)
+        tokens = set(tokenize(text))
+        self.documents[doc_id] = tokens
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                insort(self.vocabulary, token)
+                token_trigrams = trigrams(token)
+                self.trigram_counts[token] = len(token_trigrams)
+                for trigram in token_trigrams:
+                    self.by_trigram.setdefault(trigram, set()).add(token)
+            ids.add(doc_id)
+
+    def remove(self, doc_id):
+        """Tira o documento do indice (palavras sem documentos saem do vocabulario)"""
+        for token in self.documents.pop(doc_id, ()):
+            ids = self.postings[token]
+            ids.discard(doc_id)
+            if ids:
+                continue
+            del self.postings[token]
+            del self.trigram_counts[token]
+            del self.vocabulary[bisect_left(self.vocabulary, token)]
+            for trigram in trigrams(token):
+                words = self.by_trigram[trigram]
+                words.discard(token)
+                if not words:
+                    del self.by_trigram[trigram]
+
+    def expand(self, word):
+        """Retorna {palavra do vocabulario: peso} que casam com a palavra da consulta"""
+        matches = {}
+        if word in self.postings:
+            matches[word] = EXACT_SCORE
+        position = bisect_left(self.vocabulary, word)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(word):
+            matches.setdefault(self.vocabulary[position], PREFIX_SCORE)
+            position += 1
+        if len(word) >= 3:
+            wanted = trigrams(word)
+            shared = {}
+            for trigram in wanted:
+                for token in self.by_trigram.get(trigram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            for token, count in shared.items():
+                similarity = count / (len(wanted) + self.trigram_counts[token] - count)
+                if similarity >= FUZZY_THRESHOLD and similarity > matches.get(token, 0):
+                    matches[token] = similarity
+        return matches
+
+    def tiers(self, expansions):
+        """
+        Agrupa os documentos de uma palavra da consulta pelo melhor peso:
+        [(peso, {ids})] do maior para o menor, sem repetir documentos.
+        """
+        by_weight = {}
+        for token, weight in expansions.items():
+            by_weight.setdefault(weight, []).append(self.postings[token])
+        tiers = []
+        seen = set()
+        for weight in sorted(by_weight, reverse=True):
+            postings = by_weight[weight]
+            # Uma lista so e usada direto (somente leitura), sem copiar
+            ids = postings[0] if len(postings) == 1 else set().union(*postings)
+            if seen:
+                ids = ids - seen
+            if ids:
+                seen = seen | ids if seen else ids
+                tiers.append((weight, ids))
+        return tiers
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """
+        Retorna ids dos documentos que casam com todas as palavras da consulta,
+        do mais relevante para o menos relevante (no maximo limit; None = todos).
+        A nota e a soma do peso do melhor casamento de cada palavra. As notas
+        sao somadas documento a documento, comecando pela palavra com menos
+        documentos e intersectando cada faixa de peso das seguintes, entao o
+        custo acompanha o tamanho das listas e nao cresce com a quantidade de
+        combinacoes de faixas.
+        """
+        words = [self.tiers(self.expand(word)) for word in set(tokenize(query))]
+        if not words or not all(words):
+            return []
+        if len(words) == 1:
+            # Faixas ja estao em ordem de nota: basta ler ate completar o limite
+            ranked = []
+            for _, ids in words[0]:
+                ranked.extend(islice(ids, limit - len(ranked)) if limit else ids)
+                if limit and len(ranked) == limit:
+                    break
+            return ranked
+
+        words.sort(key=lambda tiers: sum(len(ids) for _, ids in tiers))
+        scores = {doc_id: weight for weight, ids in words[0] for doc_id in ids}
+        for tiers in words[1:]:
+            merged = {}
+            for weight, ids in tiers:
+                # Intersecao percorre o menor dos dois lados
+                for doc_id in scores.keys() & ids:
+                    merged[doc_id] = scores[doc_id] + weight
+            if not merged:
+                return []
+            scores = merged
+        if not limit:
+            return sorted(scores, key=scores.get, reverse=True)
+        return heapq.nlargest(limit, scores, key=scores.get)
+
+def matches(query, text):
+    """Indica se o texto casa com a consulta (mesmas regras do SearchIndex)"""
+    index = SearchIndex()
+    index.add(0, text)
+    return bool(index.search(query))